@@ -1,23 +1,79 @@
 from __future__ import annotations
 import asyncio
+from collections import deque
 from contextlib import asynccontextmanager
-from typing import Any, Dict, List, Optional, Tuple
+from itertools import chain
+from typing import Any, Deque, Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+import math
 import os
+import time
+import numpy as np
 import pandas as pd
-import json
 import networkx as nx
+import orjson
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel
 
 try:
-	from .simulation import RailwaySimulation, Train, TrainType
+	from .simulation import RailwaySimulation, Train, TrainStatus, TrainType, decision_labels
+except ImportError:
+	from simulation import RailwaySimulation, Train, TrainStatus, TrainType, decision_labels
+
+try:
+	# the on-disk cache location for these kernels is chosen by simulation.py, imported above
+	from numba import njit
 except ImportError:
-	from simulation import RailwaySimulation, Train, TrainType
+	# numba is optional; kernels below then run as plain Python
+	def njit(*_args: Any, **_kwargs: Any):  # type: ignore[no-redef]
+		def wrap(fn):
+			return fn
+		return wrap
+
+try:
+	import shapely
+except ImportError:
+	# shapely is optional; WKT polylines then go through _parse_wkt_linestring one by one
+	shapely = None  # type: ignore[assignment]
+
+try:
+	from sklearn.neighbors import BallTree
+except ImportError:
+	# scikit-learn is optional; nearest-station lookup falls back to _nearest_idx
+	BallTree = None  # type: ignore[assignment,misc]
 
 # CSV dataframes declared early so seeding can reference them
 _df_info: Optional[pd.DataFrame] = None
 _df_sched: Optional[pd.DataFrame] = None
+# Positional row indices into _df_sched per train number (str), rebuilt by _load_csvs
+_SCHED_GROUPS: Dict[str, np.ndarray] = {}
+
+# Delhi corridor station codes used in dataset schedule matching
+_DELHI_CODES = ["DLI", "NDLS", "NZM", "ANVT"]
+_CORRIDOR_CODES_SET = frozenset(_DELHI_CODES)
+# Trains with >=2 corridor visits, and their travel direction when it can be inferred
+_CORRIDOR_TRAIN_NOS: Optional[FrozenSet[str]] = None
+_CORRIDOR_DIRECTION: Dict[str, str] = {}
+# Corridor station codes per train in schedule order (trains with no corridor stop are absent)
+_CORRIDOR_VISITS: Dict[str, List[str]] = {}
+# /train/search candidates: train_info restricted to corridor trains (when known), with _search_blob
+_SEARCH_ROWS: Optional[pd.DataFrame] = None
+# Serialized /train/{train_no}/route responses; cleared whenever the CSVs are (re)loaded
+_ROUTE_JSON_CACHE: Dict[str, bytes] = {}
+# Serialized /train/{train_no}/corridor_check responses, same lifetime as _ROUTE_JSON_CACHE
+_CORRIDOR_CHECK_JSON: Dict[str, bytes] = {}
+
+def _coords_to_wkt(coords: Any) -> Optional[str]:
+    """``LINESTRING(lon lat, ...)`` from a list of ``{"lat", "lon"}`` points, or None."""
+    if not coords or not isinstance(coords, list):
+        return None
+    try:
+        pts = ", ".join([f"{c['lon']} {c['lat']}" for c in coords if 'lat' in c and 'lon' in c])
+    except Exception:
+        return None
+    return f"LINESTRING({pts})" if pts else None
+
 
 def build_delhi_network() -> nx.MultiDiGraph:
     """Build graph from precise OSM-derived JSON with exact station coords and track geometry."""
@@ -25,35 +81,35 @@ def build_delhi_network() -> nx.MultiDiGraph:
     path = os.path.join(here, "delhi_railway_graph.json")
     G = nx.MultiDiGraph()
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        # nodes
-        for n in data.get("nodes", []):
-            nid = str(n.get("id"))
-            G.add_node(
-                nid,
-                type=n.get("type") or n.get("railway_type"),
-                lat=n.get("lat"),
-                lon=n.get("lon"),
-                name=n.get("name"),
-                tags=n.get("tags", {}),
+        with open(path, "rb") as f:
+            data = orjson.loads(f.read())
+        # nodes and edges are materialized up front and added in one batch each
+        G.add_nodes_from(
+            (
+                str(n.get("id")),
+                {
+                    "type": n.get("type") or n.get("railway_type"),
+                    "lat": n.get("lat"),
+                    "lon": n.get("lon"),
+                    "name": n.get("name"),
+                    "tags": n.get("tags", {}),
+                },
+            )
+            for n in data.get("nodes", [])
+        )
+        G.add_edges_from(
+            (
+                str(e.get("source")),
+                str(e.get("target")),
+                {
+                    "length": float(e.get("length") or 0.0),
+                    "max_speed": 80,
+                    "geometry_wkt": _coords_to_wkt(e.get("coordinates")),
+                    "railway_type": e.get("railway_type"),
+                },
             )
-        # edges
-        for e in data.get("edges", []):
-            u = str(e.get("source"))
-            v = str(e.get("target"))
-            length = float(e.get("length") or 0.0)
-            coords = e.get("coordinates") or []
-            geometry_wkt = None
-            if coords and isinstance(coords, list):
-                try:
-                    # LINESTRING(lon lat, ...)
-                    pts = ", ".join([f"{c['lon']} {c['lat']}" for c in coords if 'lat' in c and 'lon' in c])
-                    if pts:
-                        geometry_wkt = f"LINESTRING({pts})"
-                except Exception:
-                    geometry_wkt = None
-            G.add_edge(u, v, length=length, max_speed=80, geometry_wkt=geometry_wkt, railway_type=e.get("railway_type"))
+            for e in data.get("edges", [])
+        )
         return G
     except Exception:
         # Fallback to simple synthetic corridor if JSON not available
@@ -79,8 +135,6 @@ def build_delhi_network() -> nx.MultiDiGraph:
 def seed_trains(sim: RailwaySimulation) -> None:
     # Seed trains using dataset schedules that include Delhi corridor
     sim.trains.clear()
-    if _df_sched is None:
-        _load_csvs()
     dataset_trains = _pick_dataset_trains(limit=10)
     if not dataset_trains:
         # fallback to minimal demo
@@ -103,12 +157,22 @@ def seed_trains(sim: RailwaySimulation) -> None:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # CSV parsing and polyline caching are the slow part of startup: run them on worker
+    # threads here rather than at import, then seed once the corridor data exists
+    await asyncio.gather(asyncio.to_thread(_load_csvs), asyncio.to_thread(_precompute_edge_polylines))
+    try:
+        seed_trains(sim)
+    except Exception:
+        # fallback will seed minimal demo if dataset not ready
+        pass
     await sim.start()
+    # Single consumer of the simulation's update queue; encodes once and fans out to every socket
+    app.state.fanout_task = asyncio.create_task(_fanout_loop())
     # Start a simple 1..4 counter for demo /train_positions endpoint (dashboard overlay)
     app.state.seq_count = 1
     app.state.seq_task = asyncio.create_task(_advance_sequence(app))
     # Start safety alerts computation loop
-    app.state.alerts = []
+    _store_alerts(app, [])
     app.state.alert_task = asyncio.create_task(_alerts_loop(app))
     try:
         yield
@@ -124,9 +188,24 @@ async def lifespan(app: FastAPI):
             app.state.alert_task.cancel()
         except Exception:
             pass
+        try:
+            app.state.fanout_task.cancel()
+        except Exception:
+            pass
+
+
+_ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered by orjson; numpy scalars/arrays serialize without casting."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=_ORJSON_OPTS)
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 app.add_middleware(
 	CORSMiddleware,
 	allow_origins=["*"],
@@ -138,6 +217,49 @@ app.add_middleware(
 G = build_delhi_network()
 sim = RailwaySimulation(G, minute_seconds=0.25)
 
+# Pre-rendered payloads for the static graph endpoints (see _rebuild_cache)
+_NETWORK_CACHE_NODES: List[Dict[str, Any]] = []
+_NETWORK_CACHE_EDGES: List[Dict[str, Any]] = []
+_NETWORK_JSON_BYTES: bytes = b""
+_STATIONS_PAYLOAD: List[Dict[str, Any]] = []
+_STATIONS_JSON_BYTES: bytes = b""
+# (u, v) -> attribute dict of the first parallel edge, i.e. G[u][v][0] without MultiDiGraph views
+_EDGE_DATA: Dict[Tuple[str, str], Dict[str, Any]] = {}
+# (u, v) -> length in meters of that same edge, as a plain float
+_EDGE_LENGTHS: Dict[Tuple[str, str], float] = {}
+
+
+def _rebuild_cache() -> None:
+    """Precompute /network and /stations responses and the flat edge index; call after any mutation of G."""
+    global _EDGE_DATA, _EDGE_LENGTHS, _NETWORK_CACHE_NODES, _NETWORK_CACHE_EDGES, _NETWORK_JSON_BYTES, _STATIONS_PAYLOAD, _STATIONS_JSON_BYTES
+    _NETWORK_CACHE_NODES = [
+        {"id": nid, "type": data.get("type"), "lat": data.get("lat"), "lon": data.get("lon"), "name": data.get("name")}
+        for nid, data in G.nodes(data=True)
+    ]
+    _NETWORK_CACHE_EDGES = [
+        {"source": u, "target": v, "length": data.get("length"), "max_speed": data.get("max_speed"), "geometry_wkt": data.get("geometry_wkt")}
+        for u, v, data in G.edges(data=True)
+    ]
+    edge_data: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for u, v, data in G.edges(data=True):
+        edge_data.setdefault((u, v), data)
+    _EDGE_DATA = edge_data
+    _EDGE_LENGTHS = {k: float(d.get("length") or 0.0) for k, d in edge_data.items()}
+    _NETWORK_JSON_BYTES = orjson.dumps({"nodes": _NETWORK_CACHE_NODES, "edges": _NETWORK_CACHE_EDGES})
+    _STATIONS_PAYLOAD = [
+        {"id": n["id"], "lat": n["lat"], "lon": n["lon"], "name": n["name"]}
+        for n in _NETWORK_CACHE_NODES
+        if n["type"] == "station"
+    ]
+    _STATIONS_JSON_BYTES = orjson.dumps({"stations": _STATIONS_PAYLOAD})
+
+
+def _edge_length(u: str, v: str) -> float:
+    return _EDGE_LENGTHS.get((u, v), 0.0)
+
+
+_rebuild_cache()
+
 
 def _csv_path(filename: str) -> str:
     # CSVs are in project root; backend file is in backend/ directory
@@ -146,88 +268,186 @@ def _csv_path(filename: str) -> str:
     return os.path.join(root, filename)
 
 
+# Only the columns the API touches are read from the CSVs
+_INFO_COLUMNS = ["Train_No", "Train_Name", "Source_Station_Name", "Destination_Station_Name", "days"]
+_SCHED_COLUMNS = ["Train_No", "Station_Code", "Station_Name", "Arrival_time", "Departure_Time", "Distance"]
+# Times stay as "HH:MM:SS" strings (pyarrow would otherwise infer time64)
+_SCHED_DTYPES = {"Train_No": "string", "Station_Code": "string", "Arrival_time": "string", "Departure_Time": "string"}
+
+
+def _read_csv(path: str, usecols: List[str], dtype: Dict[str, str]) -> pd.DataFrame:
+    try:
+        return pd.read_csv(path, engine="pyarrow", usecols=usecols, dtype=dtype)
+    except ImportError:
+        # pyarrow is optional; the default C parser accepts the same schema
+        return pd.read_csv(path, usecols=usecols, dtype=dtype)
+
+
+def _read_table(path: str, usecols: List[str], dtype: Dict[str, str]) -> pd.DataFrame:
+    """Read a CSV through a sibling ``.parquet`` cache, (re)writing it when the CSV is newer."""
+    pq_path = os.path.splitext(path)[0] + ".parquet"
+    try:
+        if os.path.exists(pq_path) and os.path.getmtime(pq_path) >= os.path.getmtime(path):
+            return pd.read_parquet(pq_path, columns=usecols)
+    except Exception:
+        pass
+    df = _read_csv(path, usecols, dtype)
+    try:
+        df.to_parquet(pq_path, compression="zstd", index=False)
+    except Exception:
+        # no parquet engine or read-only checkout: keep serving from the CSV
+        pass
+    return df
+
+
 def _load_csvs() -> None:
-    global _df_info, _df_sched
+    global _df_info, _df_sched, _SCHED_GROUPS, _CORRIDOR_TRAIN_NOS, _CORRIDOR_DIRECTION, _CORRIDOR_VISITS, _SEARCH_ROWS
     try:
         info_path = _csv_path("train_info.csv")
         sched_path = _csv_path("train_schedule.csv")
         if os.path.exists(info_path):
-            _df_info = pd.read_csv(info_path)
+            _df_info = _read_table(info_path, _INFO_COLUMNS, {"Train_No": "string"})
         else:
             _df_info = None
         if os.path.exists(sched_path):
-            _df_sched = pd.read_csv(sched_path)
+            _df_sched = _read_table(sched_path, _SCHED_COLUMNS, _SCHED_DTYPES)
         else:
             _df_sched = None
     except Exception:
         _df_info = None
         _df_sched = None
+    # Lookup columns arrive typed as strings, so request paths never run .astype(str)
+    if _df_info is not None:
+        _df_info["_search_blob"] = (
+            _df_info["Train_No"] + "|" + _df_info["Train_Name"].astype("string")
+        ).str.lower()
+        _df_info["Train_No"] = _df_info["Train_No"].astype("category")
+    # Index arrays only: slicing a DataFrame per train up front costs ~20 s on the full schedule,
+    # while get_train_route slices the one train it serves and caches the encoded result
+    groups: Dict[str, np.ndarray] = {}
+    if _df_sched is not None:
+        groups = {str(k): idx for k, idx in _df_sched.groupby("Train_No", sort=False).indices.items()}
+    _SCHED_GROUPS = groups
+    # Corridor membership and direction, computed once per load in a single groupby
+    allowed: set[str] = set()
+    directions: Dict[str, str] = {}
+    visits: Dict[str, List[str]] = {}
+    if _df_sched is not None:
+        df = _df_sched
+        cv = df.loc[df["Station_Code"].isin(_DELHI_CODES), ["Train_No", "Station_Code"]]
+        visits = cv.groupby("Train_No", sort=False)["Station_Code"].agg(list).to_dict()
+        # first/last corridor station in schedule order, per train with >=2 corridor visits
+        ends = cv.groupby("Train_No", sort=False)["Station_Code"].agg(["size", "first", "last"])
+        ends = ends[ends["size"] >= 2]
+        allowed = set(ends.index.tolist())
+        index_map = pd.Series(range(len(_DELHI_CODES)), index=_DELHI_CODES)
+        first_idx = ends["first"].map(index_map)
+        last_idx = ends["last"].map(index_map)
+        moving = first_idx != last_idx
+        labels = np.where(first_idx[moving] < last_idx[moving], "forward", "reverse").tolist()
+        directions = dict(zip(ends.index[moving].tolist(), labels))
+    _CORRIDOR_TRAIN_NOS = frozenset(allowed) if _df_sched is not None else None
+    _CORRIDOR_DIRECTION = directions
+    _CORRIDOR_VISITS = visits
+    # Search only ever returns corridor trains, so filter on membership once here
+    search_rows = _df_info
+    if search_rows is not None and _CORRIDOR_TRAIN_NOS:
+        search_rows = search_rows[search_rows["Train_No"].isin(_CORRIDOR_TRAIN_NOS)].reset_index(drop=True)
+    _SEARCH_ROWS = search_rows
+    _ROUTE_JSON_CACHE.clear()
+    _CORRIDOR_CHECK_JSON.clear()
 
 
-_load_csvs()
-# Initial seeding after CSVs are available
-try:
-    seed_trains(sim)
-except Exception:
-    # fallback will seed minimal demo if dataset not ready
-    pass
-
 # Map primary station codes to node ids from the JSON graph (exact coords)
 _PRIMARY_CODES = ["DLI", "NDLS", "NZM", "ANVT"]
 _PRIMARY_MAP: Dict[str, str] = {}
 
+# Station-like nodes with coordinates, as parallel id list / (lat, lon) array (set by _build_primary_map)
+_STATION_IDS: List[str] = []
+_STATION_LATLON: np.ndarray = np.empty((0, 2), dtype=np.float64)
+
+
+@njit(cache=True, fastmath=True)
+def _haversine_scalar(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    R = 6371000.0
+    la1 = math.radians(lat1)
+    la2 = math.radians(lat2)
+    dlat = la2 - la1
+    dlon = math.radians(lon2 - lon1)
+    h = math.sin(dlat / 2) ** 2 + math.cos(la1) * math.cos(la2) * math.sin(dlon / 2) ** 2
+    return 2 * R * math.atan2(math.sqrt(h), math.sqrt(1 - h))
+
+
+@njit(cache=True, fastmath=True)
+def _nearest_idx(lats: np.ndarray, lons: np.ndarray, tlat: float, tlon: float) -> int:
+    """Index of the (lat, lon) pair closest to the target, or -1 when empty."""
+    best_i = -1
+    best_d = 1e18
+    for i in range(lats.shape[0]):
+        d = _haversine_scalar(lats[i], lons[i], tlat, tlon)
+        if d < best_d:
+            best_d = d
+            best_i = i
+    return best_i
+
 
 def _build_primary_map() -> None:
-    global _PRIMARY_MAP
-    out: Dict[str, str] = {}
-    # First pass: by exact ref tag
+    global _PRIMARY_MAP, _STATION_IDS, _STATION_LATLON
+    # Single pass over node attributes into parallel columns
+    ids: List[str] = []
+    refs: List[str] = []
+    names: List[str] = []
+    station_ids: List[str] = []
+    station_coords: List[Tuple[float, float]] = []
     for nid, data in G.nodes(data=True):
         tags = data.get("tags") or {}
         ref = tags.get("ref") or tags.get("REF")
-        if isinstance(ref, str) and ref in _PRIMARY_CODES:
-            out[ref] = nid
-    # Fallback by name contains
-    if len(out) < 4:
-        for nid, data in G.nodes(data=True):
-            name = (data.get("name") or "").lower()
-            if "delhi junction" in name:
-                out.setdefault("DLI", nid)
-            if name == "new delhi" or "new delhi metro" in name:
-                out.setdefault("NDLS", nid)
-            if "nizamuddin" in name:
-                out.setdefault("NZM", nid)
-            if "anand vihar" in name:
-                out.setdefault("ANVT", nid)
+        ids.append(nid)
+        refs.append(ref if isinstance(ref, str) else "")
+        names.append((data.get("name") or "").lower())
+        if (data.get("type") or "").startswith("station") and data.get("lat") is not None and data.get("lon") is not None:
+            station_ids.append(nid)
+            station_coords.append((float(data["lat"]), float(data["lon"])))
+    _STATION_IDS = station_ids
+    _STATION_LATLON = np.array(station_coords, dtype=np.float64).reshape(-1, 2)
+    refs_arr = np.array(refs, dtype=str)
+    names_arr = np.array(names, dtype=str)
+    out: Dict[str, str] = {}
+    # First: by exact ref tag (last matching node wins)
+    for code in _PRIMARY_CODES:
+        hits = np.flatnonzero(refs_arr == code)
+        if hits.size:
+            out[code] = ids[hits[-1]]
+    # Fallback by name contains (first matching node wins)
+    if len(out) < 4 and names_arr.size:
+        name_rules = {
+            "DLI": np.char.find(names_arr, "delhi junction") >= 0,
+            "NDLS": (names_arr == "new delhi") | (np.char.find(names_arr, "new delhi metro") >= 0),
+            "NZM": np.char.find(names_arr, "nizamuddin") >= 0,
+            "ANVT": np.char.find(names_arr, "anand vihar") >= 0,
+        }
+        for code, hit in name_rules.items():
+            hits = np.flatnonzero(hit)
+            if hits.size:
+                out.setdefault(code, ids[hits[0]])
     # Final fallback: pick nearest station node to known IR station coordinates
-    if len(out) < 4:
-        from math import radians, sin, cos, atan2, sqrt
-        def haversine(lat1, lon1, lat2, lon2):
-            R = 6371000.0
-            dlat = radians(lat2 - lat1)
-            dlon = radians(lon2 - lon1)
-            la1 = radians(lat1)
-            la2 = radians(lat2)
-            h = sin(dlat/2)**2 + cos(la1)*cos(la2)*sin(dlon/2)**2
-            return 2*R*atan2(sqrt(h), sqrt(1-h))
+    if len(out) < 4 and len(_STATION_IDS) > 0:
         targets = {
             "DLI": (28.660932, 77.2276494),
             "NDLS": (28.6434826, 77.2227421),
             "NZM": (28.5880, 77.2510),
             "ANVT": (28.6070, 77.2890),
         }
-        for code, (tlat, tlon) in targets.items():
-            if code in out:
-                continue
-            best_id = None
-            best_d = 1e18
-            for nid, data in G.nodes(data=True):
-                if (data.get("type") or "").startswith("station") and data.get("lat") is not None and data.get("lon") is not None:
-                    d = haversine(float(data["lat"]), float(data["lon"]), tlat, tlon)
-                    if d < best_d:
-                        best_d = d
-                        best_id = nid
-            if best_id is not None:
-                out.setdefault(code, best_id)
+        missing = [code for code in targets if code not in out]
+        if BallTree is not None:
+            tree = BallTree(np.radians(_STATION_LATLON), metric="haversine")
+            _, idx = tree.query(np.radians([targets[c] for c in missing]), k=1)
+            nearest = [int(i) for i in idx[:, 0]]
+        else:
+            nearest = [_nearest_idx(_STATION_LATLON[:, 0], _STATION_LATLON[:, 1], *targets[c]) for c in missing]
+        for code, i in zip(missing, nearest):
+            if i >= 0:
+                out.setdefault(code, _STATION_IDS[i])
     _PRIMARY_MAP = out
 
 
@@ -235,19 +455,12 @@ _build_primary_map()
 
 
 def _concat_paths(paths: List[List[str]]) -> List[str]:
-    route: List[str] = []
-    for seg in paths:
-        if not seg:
-            continue
-        if not route:
-            route.extend(seg)
-        else:
-            # avoid duplicating the junction node
-            route.extend(seg[1:])
-    return route
+    segs = [seg for seg in paths if seg]
+    # keep the first segment whole; later ones drop their (duplicated) junction node
+    return list(chain(segs[0], chain.from_iterable(seg[1:] for seg in segs[1:]))) if segs else []
 
 
-def _build_corridor_route(direction: str) -> Optional[List[str]]:
+def _compute_corridor_route(direction: str) -> Optional[List[str]]:
     if len(_PRIMARY_MAP) < 2:
         return None
     try:
@@ -262,75 +475,43 @@ def _build_corridor_route(direction: str) -> Optional[List[str]]:
             v = node_seq[i + 1]
             # if path fails, skip segment
             try:
-                segs.append(nx.shortest_path(G, u, v, weight=lambda a, b, k, d: d.get("length", 1.0)))
+                segs.append(nx.shortest_path(G, u, v, weight="length"))
             except Exception:
                 continue
         return _concat_paths(segs)
     except Exception:
         return None
 
-# Delhi corridor station codes used in dataset schedule matching
-_DELHI_CODES = ["DLI", "NDLS", "NZM", "ANVT"]
-_CORRIDOR_TRAIN_NOS: Optional[set[str]] = None
 
+# Corridor routes are static for a given graph; computed once after _PRIMARY_MAP
+_CORRIDOR_ROUTES: Dict[str, Optional[List[str]]] = {}
+
+
+def _build_corridor_routes() -> None:
+    global _CORRIDOR_ROUTES
+    _CORRIDOR_ROUTES = {d: _compute_corridor_route(d) for d in ("forward", "reverse")}
+
+
+def _build_corridor_route(direction: str) -> Optional[List[str]]:
+    route = _CORRIDOR_ROUTES.get("reverse" if direction == "reverse" else "forward")
+    return list(route) if route else None
+
+
+_build_corridor_routes()
 
 def _infer_direction_from_schedule(train_no: str) -> Optional[str]:
-    if _df_sched is None:
-        return None
-    try:
-        df = _df_sched
-        sub = df[df["Train_No"].astype(str) == str(train_no)]
-        if sub.empty:
-            return None
-        codes = sub["Station_Code"].astype(str).tolist()
-        # Preserve only the Delhi corridor stations in their schedule order
-        corridor_visits = [c for c in codes if c in _DELHI_CODES]
-        if len(corridor_visits) < 2:
-            return None
-        index_map = {code: i for i, code in enumerate(_DELHI_CODES)}
-        first_idx = index_map.get(corridor_visits[0], -1)
-        last_idx = index_map.get(corridor_visits[-1], -1)
-        if first_idx < 0 or last_idx < 0 or first_idx == last_idx:
-            return None
-        return "forward" if first_idx < last_idx else "reverse"
-    except Exception:
-        return None
+    return _CORRIDOR_DIRECTION.get(str(train_no))
 
 
 def _pick_dataset_trains(limit: int = 10) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
-    if _df_sched is None:
-        return out
-    try:
-        df = _df_sched
-        # Candidate trains: those that traverse within the Delhi corridor (>=2 corridor visits)
-        mask = df["Station_Code"].astype(str).isin(_DELHI_CODES)
-        candidates = df.loc[mask, ["Train_No"]].drop_duplicates()
-        allowed: set[str] = set()
-        for tno in candidates["Train_No"].astype(str).tolist():
-            sub = df[df["Train_No"].astype(str) == str(tno)]
-            codes = sub["Station_Code"].astype(str).tolist()
-            corridor_visits = [c for c in codes if c in _DELHI_CODES]
-            if len(corridor_visits) >= 2:
-                allowed.add(str(tno))
-        global _CORRIDOR_TRAIN_NOS
-        _CORRIDOR_TRAIN_NOS = allowed
-        # Build list with inferred direction
-        cand_list = [
-            {"Train_No": tno} for tno in allowed
-        ]
-        for row in cand_list[: limit * 3]:
-            tno = str(row["Train_No"])
-            direction = _infer_direction_from_schedule(tno)
-            if not direction:
-                continue
-            route = ["DLI", "NDLS", "NZM", "ANVT"] if direction == "forward" else ["ANVT", "NZM", "NDLS", "DLI"]
-            out.append({"id": tno, "route": route, "direction": direction})
-            if len(out) >= limit:
-                break
-        return out
-    except Exception:
-        return out
+    for tno, direction in _CORRIDOR_DIRECTION.items():
+        route = ["DLI", "NDLS", "NZM", "ANVT"] if direction == "forward" else ["ANVT", "NZM", "NDLS", "DLI"]
+        out.append({"id": tno, "route": route, "direction": direction})
+        if len(out) >= limit:
+            break
+    return out
+
 
 
 class InjectDelayIn(BaseModel):
@@ -339,118 +520,264 @@ class InjectDelayIn(BaseModel):
 
 
 @app.get("/network")
-async def get_network() -> Dict[str, Any]:
-	nodes: List[Dict[str, Any]] = []
-	for nid, data in G.nodes(data=True):
-		nodes.append({"id": nid, "type": data.get("type"), "lat": data.get("lat"), "lon": data.get("lon"), "name": data.get("name")})
-	edges: List[Dict[str, Any]] = []
-	for u, v, data in G.edges(data=True):
-		edges.append({"source": u, "target": v, "length": data.get("length"), "max_speed": data.get("max_speed"), "geometry_wkt": data.get("geometry_wkt")})
-	return {"nodes": nodes, "edges": edges}
+async def get_network() -> Response:
+	# Graph is static; serve the bytes rendered by _rebuild_cache()
+	return Response(_NETWORK_JSON_BYTES, media_type="application/json")
 
 
 @app.get("/stations")
-async def get_stations() -> Dict[str, Any]:
-    nodes: List[Dict[str, Any]] = []
-    for nid, data in G.nodes(data=True):
-        if data.get("type") == "station":
-            nodes.append({"id": nid, "lat": data.get("lat"), "lon": data.get("lon"), "name": data.get("name")})
-    return {"stations": nodes}
+async def get_stations() -> Response:
+    return Response(_STATIONS_JSON_BYTES, media_type="application/json")
+
+
+# Last "state" snapshot serialized for the WebSocket, reused by /trains within one tick
+_LAST_SNAPSHOT_BYTES: bytes = b""
+_LAST_SNAPSHOT_TS: float = 0.0
+
+
+def _alerts_frame(alerts: List[Dict[str, Any]]) -> bytes:
+	"""Serialize an alerts update once, before it is queued for the WebSocket."""
+	return orjson.dumps({"type": "alerts", "data": alerts}, option=_ORJSON_OPTS)
+
+
+def _encode_update(msg: Any) -> bytes:
+	global _LAST_SNAPSHOT_BYTES, _LAST_SNAPSHOT_TS
+	# producers in this module queue ready-made frames; the simulation still queues dicts
+	if isinstance(msg, bytes):
+		return msg
+	if msg.get("type") == "state":
+		data = orjson.dumps(msg.get("data"), option=_ORJSON_OPTS)
+		_LAST_SNAPSHOT_BYTES = data
+		_LAST_SNAPSHOT_TS = time.monotonic()
+		return b'{"type":"state","data":' + data + b"}"
+	return orjson.dumps(msg, option=_ORJSON_OPTS)
 
 
 @app.get("/trains")
-async def get_trains() -> Dict[str, Any]:
-	return sim.state_snapshot()
+async def get_trains() -> Any:
+	if _LAST_SNAPSHOT_BYTES and time.monotonic() - _LAST_SNAPSHOT_TS <= sim.minute_seconds:
+		return Response(_LAST_SNAPSHOT_BYTES, media_type="application/json")
+	return Response(orjson.dumps(sim.state_snapshot(), option=_ORJSON_OPTS), media_type="application/json")
 
 
-def _parse_wkt_linestring(wkt: Optional[str]) -> List[List[float]]:
+def _parse_wkt_linestring(wkt: Optional[str]) -> np.ndarray:
+    """Parse a ``LINESTRING(lon lat, ...)`` into an (N, 2) array of ``[lat, lon]``."""
     if not wkt or not isinstance(wkt, str) or not wkt.startswith("LINESTRING"):
-        return []
+        return np.empty((0, 2), dtype=np.float64)
     try:
         inside = wkt[wkt.index("(") + 1 : wkt.rindex(")")]
-        pts = []
-        for part in inside.split(","):
-            part = part.strip()
-            if not part:
-                continue
-            lon_str, lat_str = part.split()
-            pts.append([float(lat_str), float(lon_str)])
-        return pts
+        arr = np.fromstring(inside.replace(",", " "), dtype=np.float64, sep=" ")
+        # Exactly two numbers per vertex; Z/M coordinates or a bad token would regroup into wrong pairs
+        if arr.size != 2 * (inside.count(",") + 1):
+            return np.empty((0, 2), dtype=np.float64)
+        return np.ascontiguousarray(arr.reshape(-1, 2)[:, ::-1])
     except Exception:
-        return []
+        return np.empty((0, 2), dtype=np.float64)
+
 
+def _parse_wkt_linestrings(wkts: List[Optional[str]]) -> List[np.ndarray]:
+    """Batch form of ``_parse_wkt_linestring``: all strings parsed in one GEOS call when shapely is present."""
+    empty = np.empty((0, 2), dtype=np.float64)
+    if shapely is None:
+        return [_parse_wkt_linestring(w) for w in wkts]
+    out = [empty] * len(wkts)
+    pos = [i for i, w in enumerate(wkts) if isinstance(w, str) and w.startswith("LINESTRING")]
+    if not pos:
+        return out
+    try:
+        geoms = shapely.from_wkt(np.array([wkts[i] for i in pos], dtype=object), on_invalid="ignore")
+        coords, owner = shapely.get_coordinates(geoms, return_index=True)
+    except Exception:
+        return [_parse_wkt_linestring(w) for w in wkts]
+    latlon = np.ascontiguousarray(coords[:, ::-1])
+    bounds = np.searchsorted(owner, np.arange(len(pos) + 1))
+    for k, i in enumerate(pos):
+        if bounds[k + 1] > bounds[k]:
+            out[i] = latlon[bounds[k]:bounds[k + 1]]
+    return out
 
-def _edge_polyline(u: str, v: str) -> List[List[float]]:
-    if not G.has_edge(u, v):
-        return []
-    data = G[u][v][0]
-    pts = _parse_wkt_linestring(data.get("geometry_wkt"))
-    if pts:
-        return pts
-    a = G.nodes.get(u) or {}
-    b = G.nodes.get(v) or {}
-    if a.get("lat") is not None and a.get("lon") is not None and b.get("lat") is not None and b.get("lon") is not None:
-        return [[a["lat"], a["lon"]], [b["lat"], b["lon"]]]
-    return []
 
+def _equirect_cumlen(poly: np.ndarray) -> np.ndarray:
+    """Cumulative arc length (meters) of a ``[lat, lon]`` polyline.
 
-def _locate_train_latlon(train_id: str) -> Optional[Dict[str, Any]]:
+    Uses a local equirectangular projection around the polyline's mean latitude;
+    for edges a few km long this matches haversine to ~1e-4 without any trig per segment.
+    """
+    R = 6371000.0
+    lat = np.radians(poly[:, 0])
+    x = np.radians(poly[:, 1]) * np.cos(lat.mean()) * R
+    y = lat * R
+    seg = np.hypot(np.diff(x), np.diff(y))
+    return np.concatenate(([0.0], np.cumsum(seg)))
+
+
+def _cache_edge_polyline(u: str, v: str, data: Dict[str, Any], poly: Optional[np.ndarray] = None) -> None:
+    """Store the parsed polyline (``_poly_np``) and its cumulative arc length (``_poly_cum``) on the edge."""
+    if poly is None:
+        poly = _parse_wkt_linestring(data.get("geometry_wkt"))
+    if not len(poly):
+        a = G.nodes.get(u) or {}
+        b = G.nodes.get(v) or {}
+        if a.get("lat") is not None and a.get("lon") is not None and b.get("lat") is not None and b.get("lon") is not None:
+            poly = np.array([[a["lat"], a["lon"]], [b["lat"], b["lon"]]], dtype=np.float64)
+    if len(poly) >= 2:
+        cum = _equirect_cumlen(poly)
+    else:
+        cum = np.zeros(len(poly), dtype=np.float64)
+    data["_poly_np"] = poly
+    data["_poly_cum"] = cum
+
+
+def _precompute_edge_polylines() -> None:
+    edges = list(G.edges(data=True))
+    polys = _parse_wkt_linestrings([data.get("geometry_wkt") for _, _, data in edges])
+    for (u, v, data), poly in zip(edges, polys):
+        _cache_edge_polyline(u, v, data, poly)
+
+
+def _edge_poly_cum(u: str, v: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the edge polyline and its cumulative arc length (meters)."""
+    data = _EDGE_DATA.get((u, v))
+    if data is None:
+        return np.empty((0, 2), dtype=np.float64), np.empty(0, dtype=np.float64)
+    poly = data.get("_poly_np")
+    if poly is None:
+        # edge indexed after the startup precompute: parse its WKT once and keep it
+        _cache_edge_polyline(u, v, data)
+        poly = data["_poly_np"]
+    return poly, data["_poly_cum"]
+
+
+@njit(cache=True, fastmath=True)
+def _project_on_polyline(lat: np.ndarray, lon: np.ndarray, cum: np.ndarray, frac: float) -> Tuple[float, float]:
+    """Point at ``frac`` of the polyline's arc length, interpolated within its segment."""
+    target = frac * cum[-1]
+    i = np.searchsorted(cum, target)
+    if i <= 0:
+        return lat[0], lon[0]
+    if i >= cum.shape[0]:
+        return lat[-1], lon[-1]
+    d = cum[i] - cum[i - 1]
+    f = 0.0 if d <= 0 else (target - cum[i - 1]) / d
+    return lat[i - 1] + (lat[i] - lat[i - 1]) * f, lon[i - 1] + (lon[i] - lon[i - 1]) * f
+
+
+# Compile the kernel now (same strided-column layout as the real calls), not on the first request
+_warm = np.zeros((2, 2), dtype=np.float64)
+_project_on_polyline(_warm[:, 0], _warm[:, 1], np.array([0.0, 1.0]), 0.5)
+del _warm
+
+
+class TrainPos(NamedTuple):
+    lat: float
+    lon: float
+    status: str
+
+
+# train_id -> (state key, located position); a position is recomputed only when the train moved
+_POSITION_CACHE: Dict[str, Tuple[Tuple[Any, ...], Optional[TrainPos]]] = {}
+
+
+def _locate_train_latlon(train_id: str) -> Optional[TrainPos]:
     t = sim.trains.get(train_id)
     if not t:
+        _POSITION_CACHE.pop(train_id, None)
         return None
+    key = (t.current_edge, t.position, t.status, t.route[0] if t.route else None)
+    hit = _POSITION_CACHE.get(train_id)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    pos = _compute_train_latlon(t)
+    _POSITION_CACHE[train_id] = (key, pos)
+    return pos
+
+
+def _compute_train_latlon(t: Train) -> Optional[TrainPos]:
     if not t.current_edge:
         # if not started, place at first node
         if t.route:
             n0 = t.route[0]
             ndata = G.nodes.get(n0) or {}
             if ndata.get("lat") is not None and ndata.get("lon") is not None:
-                return {"lat": ndata["lat"], "lon": ndata["lon"], "status": t.status}
+                return TrainPos(ndata["lat"], ndata["lon"], t.status)
         return None
     u, v = t.current_edge
-    poly = _edge_polyline(u, v)
+    poly, cum = _edge_poly_cum(u, v)
     if len(poly) < 2:
         return None
     # compute fraction along edge
-    length = sim._edge_length(u, v)
+    length = _edge_length(u, v)
     frac = 0.0 if length <= 0 else max(0.0, min(1.0, (t.position or 0.0) / length))
-    # project along polyline by distance fraction
-    # approximate distance using haversine via leaflet-like computation
-    def segdist(a, b):
-        from math import radians, sin, cos, atan2, sqrt
-        R = 6371000.0
-        dlat = radians(b[0] - a[0])
-        dlon = radians(b[1] - a[1])
-        la1 = radians(a[0])
-        la2 = radians(b[0])
-        h = sin(dlat/2)**2 + cos(la1)*cos(la2)*sin(dlon/2)**2
-        return 2*R*atan2(sqrt(h), sqrt(1-h))
-    total = 0.0
-    for i in range(1, len(poly)):
-        total += segdist(poly[i-1], poly[i])
-    target = frac * total
-    acc = 0.0
-    for i in range(1, len(poly)):
-        a = poly[i-1]; b = poly[i]
-        d = segdist(a, b)
-        if acc + d >= target:
-            f = 0.0 if d <= 0 else (target - acc) / d
-            lat = a[0] + (b[0] - a[0]) * f
-            lon = a[1] + (b[1] - a[1]) * f
-            return {"lat": lat, "lon": lon, "status": t.status}
-        acc += d
-    last = poly[-1]
-    return {"lat": last[0], "lon": last[1], "status": t.status}
-
-
-def _haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    from math import radians, sin, cos, atan2, sqrt
+    lat, lon = _project_on_polyline(poly[:, 0], poly[:, 1], cum, frac)
+    return TrainPos(float(lat), float(lon), t.status)
+
+
+# Scalar distance used by request handlers: the numba kernel shared with _nearest_idx
+_haversine_m = _haversine_scalar
+_haversine_m(0.0, 0.0, 0.0, 0.0)
+
+
+def _equirect_m_vec(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Element-wise distance in meters for aligned degree arrays, by equirectangular approximation.
+
+    One cos per element (at each pair's mid-latitude); well under 0.5% off the great-circle
+    distance for segments of a few km.
+    """
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1) * np.cos(np.radians(0.5 * (lat1 + lat2)))
+    return 6371000.0 * np.hypot(dlat, dlon)
+
+
+@njit(cache=True)
+def _near_pairs_kernel(lat: np.ndarray, lon: np.ndarray, radius_m: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """All (i, j, meters) with i < j and haversine distance <= ``radius_m``.
+
+    Sweep over trains sorted by latitude: a pair further apart in latitude than
+    ``radius_m`` along the meridian cannot be within range, so the inner scan stops there.
+    """
     R = 6371000.0
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    la1 = radians(lat1)
-    la2 = radians(lat2)
-    h = sin(dlat/2)**2 + cos(la1)*cos(la2)*sin(dlon/2)**2
-    return 2*R*atan2(sqrt(h), sqrt(1-h))
+    n = lat.shape[0]
+    order = np.argsort(lat)
+    la = np.radians(lat)
+    lo = np.radians(lon)
+    max_dlat = radius_m / R
+    cap = 4 * n + 16
+    out_i = np.empty(cap, dtype=np.int64)
+    out_j = np.empty(cap, dtype=np.int64)
+    out_d = np.empty(cap, dtype=np.float64)
+    k = 0
+    for a in range(n):
+        p = order[a]
+        for b in range(a + 1, n):
+            q = order[b]
+            dlat = la[q] - la[p]
+            if dlat > max_dlat:
+                break
+            dlon = lo[q] - lo[p]
+            h = np.sin(dlat / 2) ** 2 + np.cos(la[p]) * np.cos(la[q]) * np.sin(dlon / 2) ** 2
+            d = 2 * R * np.arctan2(np.sqrt(h), np.sqrt(1 - h))
+            if d <= radius_m:
+                if k == cap:
+                    cap *= 2
+                    out_i = np.concatenate((out_i, np.empty(cap - k, dtype=np.int64)))
+                    out_j = np.concatenate((out_j, np.empty(cap - k, dtype=np.int64)))
+                    out_d = np.concatenate((out_d, np.empty(cap - k, dtype=np.float64)))
+                out_i[k] = min(p, q)
+                out_j[k] = max(p, q)
+                out_d[k] = d
+                k += 1
+    return out_i[:k], out_j[:k], out_d[:k]
+
+
+# Compile the kernel now rather than on the first alerts tick
+_near_pairs_kernel(np.zeros(2), np.zeros(2), 1.0)
+
+
+def _near_pairs(lat: np.ndarray, lon: np.ndarray, radius_m: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``_near_pairs_kernel`` output ordered by (i, j), matching the order alerts have always been emitted in."""
+    ii, jj, dd = _near_pairs_kernel(lat, lon, radius_m)
+    order = np.lexsort((jj, ii))
+    return ii[order], jj[order], dd[order]
 
 
 def _same_edge(a: Optional[Tuple[str, str]], b: Optional[Tuple[str, str]]) -> bool:
@@ -465,6 +792,30 @@ def _opposite_edge(a: Optional[Tuple[str, str]], b: Optional[Tuple[str, str]]) -
     return a == (b[1], b[0])
 
 
+# Fixed alert suggestions, shared across ticks; only the delay-recovery lines name a train
+_SUG_OPPOSITE = "Issue immediate slow order to both trains; prepare hold at nearest node"
+_SUG_TRAILING = "Reduce speed of trailing train by 20-30% until headway restores"  # slow trailing train by up to 30%
+_SUG_CAUTION = "Issue caution and reduce speed to increase separation"
+_SUG_ALTERNATE = "Evaluate alternate track/route if parallel segment available"
+_SUG_MONITOR = "Monitor headway; pre-emptively reduce speed by ~10% if closing"
+_SUG_TEMPLATES: Dict[str, Tuple[str, ...]] = {
+    "opposite": (_SUG_OPPOSITE, _SUG_ALTERNATE),
+    "trailing": (_SUG_TRAILING, _SUG_ALTERNATE),
+    "caution": (_SUG_CAUTION, _SUG_ALTERNATE),
+    "warn": (_SUG_MONITOR,),
+}
+
+
+def _suggestion_template(severity: str, same: bool, opposite: bool, rel: float) -> Tuple[str, ...]:
+    if severity != "critical":
+        return _SUG_TEMPLATES["warn"]
+    if opposite:
+        return _SUG_TEMPLATES["opposite"]
+    if same and rel > 0:
+        return _SUG_TEMPLATES["trailing"]
+    return _SUG_TEMPLATES["caution"]
+
+
 def _compute_alerts() -> List[Dict[str, Any]]:
     # Thresholds (meters)
     NEAR_WARN = 800.0
@@ -480,36 +831,24 @@ def _compute_alerts() -> List[Dict[str, Any]]:
             t = sim.trains.get(tid)
             combined.append({
                 "id": tid,
-                "lat": pos["lat"],
-                "lon": pos["lon"],
+                "lat": pos.lat,
+                "lon": pos.lon,
                 "speed_mps": float(getattr(t, "speed_mps", 0.0) or 0.0),
                 "current_edge": getattr(t, "current_edge", None),
                 "delay_min": int(getattr(t, "delay_min", 0) or 0),
             })
 
-    # 2) Live demo trains from TRAIN_ROUTES/_train_states
+    # 2) Live demo trains from TRAIN_ROUTES and the demo state arrays
     try:
-        # Precompute route lengths
-        route_lengths: Dict[str, float] = {}
-        for tid, meta in TRAIN_ROUTES.items():
-            rt = meta.get("route") or []
-            total = 0.0
-            for i in range(1, len(rt)):
-                a = rt[i-1]; b = rt[i]
-                total += _haversine_m(a[0], a[1], b[0], b[1])
-            route_lengths[tid] = total
-        for tid, state in _train_states.items():
-            meta = TRAIN_ROUTES.get(tid) or {}
-            route = meta.get("route") or []
-            pos = _interpolate_position(route, state.get("progress", 0.0))
+        demo_lats, demo_lons = _demo_positions()
+        for tid, lat, lon, prog_per_tick in zip(_train_ids, demo_lats.tolist(), demo_lons.tolist(), _speed.tolist()):
             # Approx speed in m/s based on progress per 0.05s tick
-            prog_per_tick = float(state.get("speed", 0.0) or 0.0)
-            total_len = float(route_lengths.get(tid, 0.0) or 0.0)
+            total_len = _ROUTE_LENGTHS.get(tid, 0.0)
             speed_mps = (prog_per_tick * total_len / 0.05) if total_len > 0 else 0.0
             combined.append({
                 "id": tid,
-                "lat": pos[0],
-                "lon": pos[1],
+                "lat": lat,
+                "lon": lon,
                 "speed_mps": speed_mps,
                 "current_edge": None,
                 "delay_min": 0,
@@ -517,79 +856,91 @@ def _compute_alerts() -> List[Dict[str, Any]]:
     except Exception:
         pass
 
-    # Pairwise checks
-    for i in range(len(combined)):
-        for j in range(i + 1, len(combined)):
-            A = combined[i]; B = combined[j]
-            a_id = A["id"]; b_id = B["id"]
-            d = _haversine_m(A["lat"], A["lon"], B["lat"], B["lon"]) if A and B else 1e9
-            if d > NEAR_WARN:
-                continue
-            same = _same_edge(A.get("current_edge"), B.get("current_edge"))
-            opposite = _opposite_edge(A.get("current_edge"), B.get("current_edge"))
-            # Estimate relative closing speed (m/s)
-            rel = 0.0
-            if same:
-                # Determine who is behind using position along edge
-                ua, va = A.get("current_edge") if A.get("current_edge") else (None, None)
-                ub, vb = B.get("current_edge") if B.get("current_edge") else (None, None)
-                if ua is not None and ub is not None and (ua, va) == (ub, vb):
-                    # Fallback: treat higher speed as trailing uncertainty
-                    if float(getattr(sim.trains.get(a_id, object()), "position", 0.0)) < float(getattr(sim.trains.get(b_id, object()), "position", 0.0)):
-                        # A behind B
-                        rel = max(0.0, float(A.get("speed_mps", 0.0)) - float(B.get("speed_mps", 0.0)))
-                    else:
-                        # B behind A
-                        rel = max(0.0, float(B.get("speed_mps", 0.0)) - float(A.get("speed_mps", 0.0)))
-            elif opposite:
-                rel = float(A.get("speed_mps", 0.0)) + float(B.get("speed_mps", 0.0))
-            else:
-                # Different edges: approximate by speed difference
-                rel = abs(float(A.get("speed_mps", 0.0)) - float(B.get("speed_mps", 0.0)))
-
-            severity = "warn" if d > CRITICAL else "critical"
-            suggestion: List[str] = []
-            # Heuristics
-            if severity == "critical":
-                if opposite:
-                    suggestion.append("Issue immediate slow order to both trains; prepare hold at nearest node")
-                elif same and rel > 0:
-                    # slow down trailing train by up to 30%
-                    suggestion.append("Reduce speed of trailing train by 20-30% until headway restores")
+    # Pairwise checks: the compiled sweep returns only pairs within NEAR_WARN
+    if len(combined) < 2:
+        return alerts
+    lat = np.array([c["lat"] for c in combined], dtype=np.float64)
+    lon = np.array([c["lon"] for c in combined], dtype=np.float64)
+    ii, jj, dist = _near_pairs(lat, lon, NEAR_WARN)
+    for i, j, d in zip(ii.tolist(), jj.tolist(), dist.tolist()):
+        A = combined[i]; B = combined[j]
+        a_id = A["id"]; b_id = B["id"]
+        same = _same_edge(A.get("current_edge"), B.get("current_edge"))
+        opposite = _opposite_edge(A.get("current_edge"), B.get("current_edge"))
+        # Estimate relative closing speed (m/s)
+        rel = 0.0
+        if same:
+            # Determine who is behind using position along edge
+            ua, va = A.get("current_edge") if A.get("current_edge") else (None, None)
+            ub, vb = B.get("current_edge") if B.get("current_edge") else (None, None)
+            if ua is not None and ub is not None and (ua, va) == (ub, vb):
+                # Fallback: treat higher speed as trailing uncertainty
+                if float(getattr(sim.trains.get(a_id, object()), "position", 0.0)) < float(getattr(sim.trains.get(b_id, object()), "position", 0.0)):
+                    # A behind B
+                    rel = max(0.0, float(A.get("speed_mps", 0.0)) - float(B.get("speed_mps", 0.0)))
                 else:
-                    suggestion.append("Issue caution and reduce speed to increase separation")
-                # Consider track change if alternative exists
-                suggestion.append("Evaluate alternate track/route if parallel segment available")
-            else:
-                suggestion.append("Monitor headway; pre-emptively reduce speed by ~10% if closing")
-
-            # Delay-based recovery suggestion (if safe)
-            if (int(A.get("delay_min", 0)) or 0) >= 5 and d > CRITICAL:
-                suggestion.append("Train " + a_id + " can increase speed by ~10% where safe to recover delay")
-            if (int(B.get("delay_min", 0)) or 0) >= 5 and d > CRITICAL:
-                suggestion.append("Train " + b_id + " can increase speed by ~10% where safe to recover delay")
-
-            alerts.append({
-                "pair": {"a": a_id, "b": b_id},
-                "distance_m": round(d, 1),
-                "relative_speed_mps": round(rel, 2),
-                "same_edge": same,
-                "opposite_edge": opposite,
-                "severity": severity,
-                "suggestions": suggestion,
-            })
+                    # B behind A
+                    rel = max(0.0, float(B.get("speed_mps", 0.0)) - float(A.get("speed_mps", 0.0)))
+        elif opposite:
+            rel = float(A.get("speed_mps", 0.0)) + float(B.get("speed_mps", 0.0))
+        else:
+            # Different edges: approximate by speed difference
+            rel = abs(float(A.get("speed_mps", 0.0)) - float(B.get("speed_mps", 0.0)))
+
+        severity = "warn" if d > CRITICAL else "critical"
+        suggestion = list(_suggestion_template(severity, same, opposite, rel))
+
+        # Delay-based recovery suggestion (if safe)
+        if (int(A.get("delay_min", 0)) or 0) >= 5 and d > CRITICAL:
+            suggestion.append("Train " + a_id + " can increase speed by ~10% where safe to recover delay")
+        if (int(B.get("delay_min", 0)) or 0) >= 5 and d > CRITICAL:
+            suggestion.append("Train " + b_id + " can increase speed by ~10% where safe to recover delay")
+
+        alerts.append({
+            "pair": {"a": a_id, "b": b_id},
+            "distance_m": round(d, 1),
+            "relative_speed_mps": round(rel, 2),
+            "same_edge": same,
+            "opposite_edge": opposite,
+            "severity": severity,
+            "suggestions": suggestion,
+        })
     return alerts
 
 
+def _alerts_fingerprint() -> int:
+    """Hash of the simulation-train state _compute_alerts reads.
+
+    Demo trains move every 50 ms tick and are left out: _advance_sequence already recomputes,
+    stores and broadcasts their alerts on each tick.
+    """
+    return hash(tuple(
+        (tid, t.current_edge, t.position, t.status, t.speed_mps, t.delay_min, t.route[0] if t.route else None)
+        for tid, t in sim.trains.items()
+    ))
+
+
+def _store_alerts(app: FastAPI, alerts: List[Dict[str, Any]]) -> None:
+    """Replace the current alerts; /safety_alerts re-encodes them on its next request."""
+    app.state.alerts = alerts
+    app.state.alerts_bytes = None
+
+
 async def _alerts_loop(app: FastAPI) -> None:
+    last_fp: Optional[int] = None
     while True:
         try:
             await asyncio.sleep(1.0)
+            # No simulation train changed since the last pass (e.g. paused sim): skip the recompute and broadcast
+            fp = _alerts_fingerprint()
+            if fp == last_fp:
+                continue
+            last_fp = fp
             alerts = _compute_alerts()
-            app.state.alerts = alerts
+            _store_alerts(app, alerts)
             # Broadcast over sim updates channel for frontend popup handling
             try:
-                await sim._updates.put({"type": "alerts", "data": alerts})  # type: ignore[attr-defined]
+                sim.publish(_alerts_frame(alerts))
             except Exception:
                 pass
         except asyncio.CancelledError:
@@ -603,28 +954,18 @@ async def get_train_position(train_id: str) -> Dict[str, Any]:
     p = _locate_train_latlon(train_id)
     if not p:
         return {"success": False, "error": "train not found or not positioned"}
-    return {"success": True, "position": p}
+    return {"success": True, "position": p._asdict()}
 
 
 @app.get("/train/search")
 async def search_trains(q: str) -> Dict[str, Any]:
-    if not _df_info is not None:
-        _load_csvs()
-    if _df_info is None:
+    if _SEARCH_ROWS is None:
         return {"trains": []}
     ql = q.strip().lower()
-    df = _df_info
-    # Match on Train_No or Train_Name contains
+    df = _SEARCH_ROWS
+    # Match on Train_No or Train_Name contains (rows are already limited to the corridor set)
     try:
-        # Base name/number match
-        mask = (
-            df["Train_No"].astype(str).str.contains(ql, case=False, na=False)
-            | df["Train_Name"].astype(str).str.lower().str.contains(ql, na=False)
-        )
-        # If corridor set is available, restrict to those trains only
-        global _CORRIDOR_TRAIN_NOS
-        if _CORRIDOR_TRAIN_NOS is not None and len(_CORRIDOR_TRAIN_NOS) > 0:
-            mask = mask & df["Train_No"].astype(str).isin(list(_CORRIDOR_TRAIN_NOS))
+        mask = df["_search_blob"].str.contains(ql, regex=False, na=False)
         cols = ["Train_No", "Train_Name", "Source_Station_Name", "Destination_Station_Name", "days"]
         rows = df.loc[mask, cols].head(20).to_dict(orient="records")  # type: ignore[arg-type]
         return {"trains": rows}
@@ -633,17 +974,22 @@ async def search_trains(q: str) -> Dict[str, Any]:
 
 
 @app.get("/train/{train_no}/route")
-async def get_train_route(train_no: str) -> Dict[str, Any]:
-    if not _df_sched is not None:
-        _load_csvs()
+async def get_train_route(train_no: str) -> Any:
     if _df_sched is None:
         return {"stations": []}
-    df = _df_sched
+    cached = _ROUTE_JSON_CACHE.get(train_no)
+    if cached is not None:
+        return Response(cached, media_type="application/json")
     try:
-        sub = df[df["Train_No"].astype(str) == str(train_no)]
+        idx = _SCHED_GROUPS.get(str(train_no))
+        if idx is None:
+            return {"stations": []}
+        sub = _df_sched.iloc[idx]
         cols = ["Station_Code", "Station_Name", "Arrival_time", "Departure_Time", "Distance"]
         rows = sub[cols].to_dict(orient="records")  # type: ignore[arg-type]
-        return {"stations": rows}
+        payload = orjson.dumps({"stations": rows})
+        _ROUTE_JSON_CACHE[train_no] = payload
+        return Response(payload, media_type="application/json")
     except Exception:
         return {"stations": []}
 
@@ -665,10 +1011,20 @@ async def post_reset() -> Dict[str, Any]:
 
 @app.post("/reload_csv")
 async def post_reload_csv() -> Dict[str, Any]:
-    _load_csvs()
+    await asyncio.to_thread(_load_csvs)
     return {"success": True, "info_loaded": _df_info is not None, "schedule_loaded": _df_sched is not None}
 
 
+@app.post("/reload_network")
+async def post_reload_network() -> Dict[str, Any]:
+    # G is static today; rebuild the serialized /network and /stations bytes if it is ever mutated
+    _rebuild_cache()
+    await asyncio.to_thread(_precompute_edge_polylines)
+    sim.reindex_edges()
+    _POSITION_CACHE.clear()
+    return {"success": True, "nodes": len(_NETWORK_CACHE_NODES), "edges": len(_NETWORK_CACHE_EDGES)}
+
+
 @app.post("/simulate/train")
 async def post_simulate_train(
     direction: Optional[str] = None,
@@ -698,12 +1054,7 @@ async def post_simulate_reseed() -> Dict[str, Any]:
 
 @app.post("/simulate/by_train_no")
 async def post_simulate_by_train_no(train_no: str) -> Dict[str, Any]:
-    # Ensure corridor set is available
-    if _df_sched is None:
-        _load_csvs()
-    if _CORRIDOR_TRAIN_NOS is None or len(_CORRIDOR_TRAIN_NOS) == 0:
-        # populate via picker (it caches allowed set)
-        _ = _pick_dataset_trains(limit=10)
+    # Corridor set is computed by _load_csvs at startup (or /reload_csv)
     if _CORRIDOR_TRAIN_NOS is None or str(train_no) not in _CORRIDOR_TRAIN_NOS:
         return {"success": False, "error": "train does not traverse the Delhi corridor (DLI/NDLS/NZM/ANVT)"}
     direction = _infer_direction_from_schedule(str(train_no)) or "forward"
@@ -749,25 +1100,25 @@ async def post_simulate_near_collision() -> Dict[str, Any]:
         sim.add_train(t2)
 
         # Place both near the middle from opposite directions
-        Luv = sim._edge_length(u, v)
-        Lvu = sim._edge_length(v, u)
+        Luv = _edge_length(u, v)
+        Lvu = _edge_length(v, u)
         t1.current_edge = (u, v)
         t2.current_edge = (v, u)
         t1.position = max(0.0, 0.49 * Luv)
         t2.position = max(0.0, 0.49 * Lvu)
-        t1.status = "running"
-        t2.status = "running"
+        t1.status = TrainStatus.RUNNING
+        t2.status = TrainStatus.RUNNING
 
         # Compute current distance for response
         p1 = _locate_train_latlon("HC1")
         p2 = _locate_train_latlon("HC2")
         dist = None
         if p1 and p2:
-            dist = _haversine_m(p1["lat"], p1["lon"], p2["lat"], p2["lon"])  # type: ignore[arg-type]
+            dist = _haversine_m(p1.lat, p1.lon, p2.lat, p2.lon)
         # Push immediate alerts update
         try:
             alerts = _compute_alerts()
-            await sim._updates.put({"type": "alerts", "data": alerts})  # type: ignore[attr-defined]
+            sim.publish(_alerts_frame(alerts))
         except Exception:
             pass
         return {"success": True, "edge": {"u": u, "v": v}, "approx_distance_m": round(dist, 1) if dist is not None else None}
@@ -776,24 +1127,26 @@ async def post_simulate_near_collision() -> Dict[str, Any]:
 
 
 @app.get("/train/{train_no}/corridor_check")
-async def get_train_corridor_check(train_no: str) -> Dict[str, Any]:
-    if _df_sched is None:
-        _load_csvs()
+async def get_train_corridor_check(train_no: str) -> Any:
     if _df_sched is None:
         return {"success": False, "error": "schedule not loaded"}
+    cached = _CORRIDOR_CHECK_JSON.get(train_no)
+    if cached is not None:
+        return Response(cached, media_type="application/json")
     try:
-        df = _df_sched
-        sub = df[df["Train_No"].astype(str) == str(train_no)]
-        codes = sub["Station_Code"].astype(str).tolist()
-        visits = [c for c in codes if c in _DELHI_CODES]
+        visits = _CORRIDOR_VISITS.get(str(train_no), [])
         qualifies = len(visits) >= 2
         direction = _infer_direction_from_schedule(str(train_no)) if qualifies else None
-        return {
+        payload = orjson.dumps({
             "success": True,
             "qualifies": qualifies,
             "visits": visits,
             "direction": direction,
-        }
+        })
+        if visits:
+            # only trains with corridor stops are cached, so arbitrary ids cannot grow the dict
+            _CORRIDOR_CHECK_JSON[train_no] = payload
+        return Response(payload, media_type="application/json")
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -805,26 +1158,78 @@ async def post_optimize(body: Dict[str, Any] | None = None) -> Dict[str, Any]:
 	try:
 		conflicts = sim._find_conflicts()  # type: ignore[attr-defined]
 		decisions = sim._optimizer.decide(conflicts, sim.trains)  # type: ignore[attr-defined]
-		return {"success": True, "decisions": decisions}
+		return {"success": True, "decisions": decision_labels(decisions)}
 	except Exception as e:
 		return {"success": False, "error": str(e)}
 
 
+class _WsClient:
+	"""Per-socket outbox: frames are appended by _broadcast and drained by the socket's handler."""
+	__slots__ = ("frames", "waker")
+
+	def __init__(self) -> None:
+		# a stalled client drops its oldest frames instead of growing without bound
+		self.frames: Deque[bytes] = deque(maxlen=256)
+		self.waker: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+_WS_CLIENTS: Set[_WsClient] = set()
+# Frames arriving within this window after a wake-up go out together as one "batch" frame
+_WS_BATCH_WINDOW = 0.05
+_WS_BATCH_SIZE = 32
+
+
+def _broadcast(frame: bytes) -> None:
+	for client in _WS_CLIENTS:
+		client.frames.append(frame)
+		if not client.waker.done():
+			client.waker.set_result(None)
+
+
+async def _fanout_loop() -> None:
+	queue = await sim.updates()
+	while True:
+		msg = await queue.get()
+		try:
+			# The simulation queues a minute's decisions and state as one batch; sockets get them as
+			# separate frames so their own coalescing never nests batches
+			if isinstance(msg, dict) and msg.get("type") == "batch":
+				for part in msg["msgs"]:
+					_broadcast(_encode_update(part))
+			else:
+				_broadcast(_encode_update(msg))
+		except Exception:
+			pass
+
+
 @app.websocket("/updates")
 async def ws_updates(ws: WebSocket) -> None:
 	await ws.accept()
+	client = _WsClient()
+	# Start from a full snapshot; the simulation otherwise sends only changed trains ("delta")
+	client.frames.append(b'{"type":"state","data":' + orjson.dumps(sim.state_snapshot(), option=_ORJSON_OPTS) + b"}")
+	client.waker.set_result(None)
+	_WS_CLIENTS.add(client)
+	loop = asyncio.get_running_loop()
 	try:
-		queue = await sim.updates()
 		while True:
-			msg = await queue.get()
-			await ws.send_json(msg)
+			await client.waker
+			await asyncio.sleep(_WS_BATCH_WINDOW)
+			client.waker = loop.create_future()
+			while client.frames:
+				n = min(len(client.frames), _WS_BATCH_SIZE)
+				frames = [client.frames.popleft() for _ in range(n)]
+				frame = frames[0] if n == 1 else b'{"type":"batch","msgs":[' + b",".join(frames) + b"]}"
+				# still a text frame so browser clients can JSON.parse it
+				await ws.send_text(frame.decode())
 	except WebSocketDisconnect:
 		return
+	finally:
+		_WS_CLIENTS.discard(client)
 
 
 # --- Continuous train movement simulation ---
 import math
-import random
 
 # Define train routes as polylines between Delhi stations (expanded for visibility)
 TRAIN_ROUTES = {
@@ -922,86 +1327,115 @@ TRAIN_ROUTES = {
     }
 }
 
-# Train state tracking
-_train_states = {}
+
+def _route_table(route) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``(lats, lons, cum)`` for a ``[(lat, lon), ...]`` route; ``cum`` is the cumulative length in meters.
+
+    Demo segments are at most a couple of km, so the equirectangular approximation stands in for haversine.
+    """
+    pts = np.asarray(route, dtype=np.float64).reshape(-1, 2)
+    lats = np.ascontiguousarray(pts[:, 0])
+    lons = np.ascontiguousarray(pts[:, 1])
+    seg = _equirect_m_vec(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    return lats, lons, np.concatenate(([0.0], np.cumsum(seg)))
+
+
+# Samples per demo route in the uniform-arclength tables
+_ROUTE_SAMPLES = 1024
+
+
+def _resample_route(route, k: int = _ROUTE_SAMPLES) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Resample a route to ``k`` points equally spaced by arc length: ``(lats, lons, total_m)``.
+
+    Sample ``i`` sits at ``i / (k - 1)`` of the route, so a progress value maps to an index directly.
+    """
+    lats, lons, cum = _route_table(route)
+    if not len(lats):
+        return np.empty(0), np.empty(0), 0.0
+    total = float(cum[-1])
+    if total <= 0:
+        return np.full(k, lats[0]), np.full(k, lons[0]), 0.0
+    s = np.linspace(0.0, total, k)
+    return np.interp(s, cum, lats), np.interp(s, cum, lons), total
+
+
+# Demo routes are static: uniform-arclength tables and total lengths are built once
+_ROUTE_TABLES = {tid: _resample_route(meta.get("route") or []) for tid, meta in TRAIN_ROUTES.items()}
+_ROUTE_LENGTHS = {tid: total for tid, (_, _, total) in _ROUTE_TABLES.items()}
+
+# Demo train state as parallel arrays in _train_ids order (filled by _init_demo_trains).
+# Each train runs out and back along its route: _phase in [0, 2) grows monotonically by _speed per
+# tick, and progress is the triangle wave 1 - |phase - 1| (phase < 1 heading forward, >= 1 returning).
+_train_ids: List[str] = []
+_train_colors: List[str] = []
+_phase = np.empty(0, dtype=np.float64)
+_speed = np.empty(0, dtype=np.float64)
+_progress = np.empty(0, dtype=np.float64)  # derived from _phase once per tick
+# Uniform route tables stacked in _train_ids order, shape (N, _ROUTE_SAMPLES). float32 keeps
+# ~0.2 m resolution at Delhi's latitude with half the memory traffic of float64 per gather.
+_lats_u = np.empty((0, _ROUTE_SAMPLES), dtype=np.float32)
+_lons_u = np.empty((0, _ROUTE_SAMPLES), dtype=np.float32)
 _route_cache = {}
+# OS-entropy seeded; start phases for all demo trains are drawn in one call
+_DEMO_RNG = np.random.default_rng()
+
+
+def _init_demo_trains() -> None:
+    """Place every TRAIN_ROUTES train at a random progress, heading forward"""
+    global _train_ids, _train_colors, _phase, _speed, _progress, _lats_u, _lons_u
+    _train_ids = list(TRAIN_ROUTES.keys())
+    _train_colors = [TRAIN_ROUTES[tid]["color"] for tid in _train_ids]
+    _phase = _DEMO_RNG.random(len(_train_ids))
+    _speed = np.array([TRAIN_ROUTES[tid]["speed"] for tid in _train_ids], dtype=np.float64)
+    _progress = 1.0 - np.abs(_phase - 1.0)
+    # routes without coordinates park at a fixed default point in central New Delhi
+    _lats_u = np.array([_ROUTE_TABLES[tid][0] if len(_ROUTE_TABLES[tid][0]) else np.full(_ROUTE_SAMPLES, 28.6448) for tid in _train_ids], dtype=np.float32).reshape(-1, _ROUTE_SAMPLES)
+    _lons_u = np.array([_ROUTE_TABLES[tid][1] if len(_ROUTE_TABLES[tid][1]) else np.full(_ROUTE_SAMPLES, 77.2167) for tid in _train_ids], dtype=np.float32).reshape(-1, _ROUTE_SAMPLES)
+
+
+def _step_demo_trains() -> None:
+    """Advance every demo train one tick; branchless, reversal falls out of the triangle wave"""
+    np.add(_phase, _speed, out=_phase)
+    np.mod(_phase, 2.0, out=_phase)
+    np.subtract(1.0, np.abs(_phase - 1.0), out=_progress)
+
+
+def _demo_positions() -> Tuple[np.ndarray, np.ndarray]:
+    """Current (lats, lons) of all demo trains in one gather over the stacked route tables"""
+    x = _progress * (_ROUTE_SAMPLES - 1)
+    i0 = np.minimum(x.astype(np.int64), _ROUTE_SAMPLES - 2)
+    f = (x - i0).astype(np.float32)
+    rows = np.arange(len(i0))
+    lat0 = _lats_u[rows, i0]
+    lon0 = _lons_u[rows, i0]
+    return lat0 + (_lats_u[rows, i0 + 1] - lat0) * f, lon0 + (_lons_u[rows, i0 + 1] - lon0) * f
+
+
+def _demo_directions() -> np.ndarray:
+    return np.where(_phase < 1.0, 1, -1)
 
-def _interpolate_position(route, progress):
-    """Interpolate position along route based on progress (0.0 to 1.0)"""
-    if not route or len(route) < 2:
-        return route[0] if route else (28.6448, 77.2167)
-    
-    total_length = 0
-    segments = []
-    for i in range(len(route) - 1):
-        p1, p2 = route[i], route[i + 1]
-        # Haversine distance
-        lat1, lon1 = p1
-        lat2, lon2 = p2
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-        distance = 2 * 6371000 * math.asin(math.sqrt(a))  # meters
-        segments.append((p1, p2, distance))
-        total_length += distance
-    
-    if total_length == 0:
-        return route[0]
-    
-    target_distance = progress * total_length
-    current_distance = 0
-    
-    for p1, p2, segment_length in segments:
-        if current_distance + segment_length >= target_distance:
-            # Interpolate within this segment
-            segment_progress = (target_distance - current_distance) / segment_length
-            lat1, lon1 = p1
-            lat2, lon2 = p2
-            lat = lat1 + (lat2 - lat1) * segment_progress
-            lon = lon1 + (lon2 - lon1) * segment_progress
-            return (lat, lon)
-        current_distance += segment_length
-    
-    return route[-1]
 
 async def _advance_sequence(app: FastAPI) -> None:
     """Continuous train movement simulation"""
     # Initialize train states - start at different positions to avoid gaps
-    for train_id, route_data in TRAIN_ROUTES.items():
-        _train_states[train_id] = {
-            "progress": random.uniform(0.0, 1.0),
-            "direction": 1,
-            "color": route_data["color"],
-            "speed": route_data["speed"]
-        }
-    
+    _init_demo_trains()
+    last_alerts_key: Optional[Tuple[Tuple[str, str, str], ...]] = None
+
     while True:
         try:
             await asyncio.sleep(0.05)  # Update 20 times per second for very smooth movement
-            
-            for train_id, state in _train_states.items():
-                # Update progress based on direction
-                if state["direction"] == 1:
-                    state["progress"] += state["speed"]
-                    # Check if reached end - reverse immediately
-                    if state["progress"] >= 1.0:
-                        state["progress"] = 1.0
-                        state["direction"] = -1
-                else:
-                    state["progress"] -= state["speed"]
-                    # Check if reached start - reverse immediately
-                    if state["progress"] <= 0.0:
-                        state["progress"] = 0.0
-                        state["direction"] = 1
-                
-                # Keep progress within bounds
-                state["progress"] = max(0.0, min(1.0, state["progress"]))
+            _step_demo_trains()
 
             # After updating demo positions, compute alerts and store/broadcast
             try:
                 alerts = _compute_alerts()
-                app.state.alerts = alerts
-                await sim._updates.put({"type": "alerts", "data": alerts})  # type: ignore[attr-defined]
+                _store_alerts(app, alerts)
+                # Broadcast only when the set of alerting pairs or a severity changes; distances
+                # still refresh through /safety_alerts, which serves the alerts stored here
+                key = tuple((a["pair"]["a"], a["pair"]["b"], a["severity"]) for a in alerts)
+                if key != last_alerts_key:
+                    last_alerts_key = key
+                    sim.publish(_alerts_frame(alerts))
             except Exception:
                 pass
             
@@ -1011,45 +1445,47 @@ async def _advance_sequence(app: FastAPI) -> None:
             await asyncio.sleep(0.05)
 
 @app.get("/train_positions")
-async def get_train_positions() -> Dict[str, Any]:
-    """Get current train positions with routes"""
-    positions = []
-    routes = []
+async def get_train_positions(include_routes: bool = True) -> Dict[str, Any]:
+    """Get current train positions; routes are static, so pollers can fetch them once and pass include_routes=false"""
+    # All positions in one vectorized pass, then a single zip into the response rows;
+    # 6 decimals (~0.1 m) drops float32 noise digits from the JSON
+    lats, lons = _demo_positions()
+    lats = np.round(lats.astype(np.float64), 6)
+    lons = np.round(lons.astype(np.float64), 6)
+    positions = [
+        {"train_id": train_id, "lat": lat, "lon": lon, "color": color, "progress": progress, "direction": direction}
+        for train_id, lat, lon, color, progress, direction in zip(
+            _train_ids, lats.tolist(), lons.tolist(), _train_colors, _progress.tolist(), _demo_directions().tolist()
+        )
+    ]
     
-    for train_id, state in _train_states.items():
-        route_data = TRAIN_ROUTES[train_id]
-        route = route_data["route"]
-        
-        # Calculate current position
-        current_pos = _interpolate_position(route, state["progress"])
-        
-        positions.append({
-            "train_id": train_id,
-            "lat": current_pos[0],
-            "lon": current_pos[1],
-            "color": state["color"],
-            "progress": state["progress"],
-            "direction": state["direction"]
-        })
-        
-        # Add route if not already cached
-        if train_id not in _route_cache:
-            _route_cache[train_id] = {
-                "coordinates": route,
-                "color": state["color"]
-            }
+    # Add routes not already cached
+    if len(_route_cache) < len(_train_ids):
+        for train_id, color in zip(_train_ids, _train_colors):
+            if train_id not in _route_cache:
+                _route_cache[train_id] = {
+                    "coordinates": TRAIN_ROUTES[train_id]["route"],
+                    "color": color
+                }
     
-    return {
+    out = {
         "success": True, 
         "data": positions, 
-        "routes": list(_route_cache.values()),
         "count": len(positions)
     }
+    if include_routes:
+        out["routes"] = list(_route_cache.values())
+    return out
 
 
 @app.get("/safety_alerts")
-async def get_safety_alerts() -> Dict[str, Any]:
-    return {"success": True, "alerts": getattr(app.state, "alerts", [])}
+async def get_safety_alerts() -> Response:
+    # Encoded at most once per alerts update, however often the dashboard polls
+    body = getattr(app.state, "alerts_bytes", None)
+    if body is None:
+        body = orjson.dumps({"success": True, "alerts": getattr(app.state, "alerts", [])}, option=_ORJSON_OPTS)
+        app.state.alerts_bytes = body
+    return Response(content=body, media_type="application/json")
 
 
 if __name__ == "__main__":
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
 import asyncio
-import time
+import os
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Dict, List, Optional, Tuple
 
 import networkx as nx
+import numpy as np
+
+try:
+	import numba
+	from numba import njit
+	# Cached kernels pickle the importing module's name, so the backend imported as a package
+	# (`backend.main`) and from inside backend/ (`main`) need separate caches. This is the one place the
+	# directory is set: numba's config is process-wide and main.py imports this module first, so its
+	# kernels land here too. An explicit NUMBA_CACHE_DIR is left alone.
+	if not numba.config.CACHE_DIR:
+		numba.config.CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__", f"numba-{__name__}")
+except ImportError:
+	# numba is optional; the tick kernel then runs as plain Python
+	def njit(*_args: Any, **_kwargs: Any):  # type: ignore[no-redef]
+		def wrap(fn):
+			return fn
+		return wrap
 
 
 class TrainType(str, Enum):
@@ -15,6 +32,13 @@ class TrainType(str, Enum):
 	LOCAL = "local"
 
 
+class TrainStatus(str, Enum):
+	STOPPED = "stopped"
+	RUNNING = "running"
+	HELD = "held"
+	DELAYED = "delayed"
+
+
 @dataclass
 class TrackSegment:
 	segment_id: str
@@ -35,7 +59,40 @@ class Train:
 	current_edge: Tuple[str, str] | None = None
 	delay_min: int = 0
 	planned_times_min: Dict[str, int] = field(default_factory=dict)  # node -> minute
-	status: str = "stopped"  # running|stopped|held|delayed
+	status: TrainStatus = TrainStatus.STOPPED
+	current_route_idx: int = 0  # index in route of current_edge[0]
+	_node_to_idx: Dict[str, int] = field(default_factory=dict, repr=False, compare=False)  # node -> first index in route
+	_route_start: int = field(default=-1, repr=False, compare=False)  # offset of this route in the packed route arrays
+
+
+@njit(cache=True)
+def _advance_kernel(positions: np.ndarray, lengths: np.ndarray, vmax_mps: np.ndarray, speeds: np.ndarray) -> np.ndarray:
+	"""One simulated minute of progress along each current edge, in place; returns which trains reached its end."""
+	n = positions.shape[0]
+	done = np.empty(n, dtype=np.bool_)
+	for i in range(n):
+		v = min(speeds[i], vmax_mps[i])
+		if v < 0.0:
+			v = 0.0
+		pos = min(lengths[i], positions[i] + v * 60.0)
+		positions[i] = pos
+		done[i] = pos >= lengths[i] - 1e-3
+	return done
+
+
+# Compile at import rather than on the first simulated minute
+_advance_kernel(np.zeros(1), np.ones(1), np.ones(1), np.ones(1))
+
+
+def decision_labels(decisions: Dict[Tuple[str, str], str]) -> Dict[str, str]:
+	"""Edge-keyed decisions as JSON-friendly {"u->v": winner}; only needed where they are serialized."""
+	return {f"{u}->{v}": winner for (u, v), winner in decisions.items()}
+
+
+# Pending updates kept for the consumer before the oldest are dropped
+UPDATES_QUEUE_SIZE = 32
+# Simulated minutes between full "state" frames; the ones in between are "delta" frames
+FULL_STATE_EVERY = 20
 
 
 class RailwaySimulation:
@@ -53,23 +110,75 @@ class RailwaySimulation:
 		self.minute_seconds = minute_seconds  # wall time per simulated minute
 		self._running = False
 		self._task: Optional[asyncio.Task] = None
-		self._updates: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+		# Bounded: when the consumer falls behind, publish() drops the oldest update
+		self._updates: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=UPDATES_QUEUE_SIZE)
 		# Lazy import to avoid hard dependency loop
 		try:
 			from .optimizer import ConflictDecisionOptimizer  # type: ignore
 		except ImportError:
 			from optimizer import ConflictDecisionOptimizer  # type: ignore
 		self._optimizer = ConflictDecisionOptimizer()
+		# Per-train state last sent by _loop, for delta frames
+		self._emitted: Dict[str, Tuple[Any, ...]] = {}
+		self._ticks = 0
+		self._edge_len: Dict[Tuple[str, str], float] = {}
+		self._edge_vmax: Dict[Tuple[str, str], float] = {}
+		# Routes packed CSR-style, back to back: the length and max speed (m/s) of the edge leaving each
+		# route position (-1 / inf past the end or off-graph).
+		# Rebuilt lazily from self.trains when a train is added or the graph is reindexed.
+		self._route_edge_len = np.empty(0, dtype=np.float64)
+		self._route_edge_vmax_mps = np.empty(0, dtype=np.float64)
+		self._routes_dirty = True
+		self.reindex_edges()
+
+	def reindex_edges(self) -> None:
+		"""Cache per-edge length and max speed (km/h) from the first parallel edge; call again if the graph changes."""
+		edge_len: Dict[Tuple[str, str], float] = {}
+		edge_vmax: Dict[Tuple[str, str], float] = {}
+		for u, v, k, data in self.graph.edges(keys=True, data=True):
+			if (u, v) in edge_len and k != 0:
+				continue
+			edge_len[(u, v)] = float(data.get("length", 0.0))
+			vmax = data.get("max_speed")
+			if vmax is not None:
+				edge_vmax[(u, v)] = float(vmax)
+			else:
+				edge_vmax.pop((u, v), None)
+		self._edge_len = edge_len
+		self._edge_vmax = edge_vmax
+		self._routes_dirty = True
+
+	def _pack_routes(self) -> None:
+		"""Lay out every train's per-edge route length and speed cap in contiguous arrays."""
+		edge_len: List[float] = []
+		edge_vmax: List[float] = []
+		for t in self.trains.values():
+			t._route_start = len(edge_len)
+			route = t.route
+			for i, node in enumerate(route):
+				edge = (node, route[i + 1]) if i + 1 < len(route) else None
+				edge_len.append(self._edge_len.get(edge, -1.0))
+				# edges without a max_speed don't cap the train
+				edge_vmax.append(self._edge_vmax.get(edge, np.inf) / 3.6)
+		self._route_edge_len = np.array(edge_len, dtype=np.float64)
+		self._route_edge_vmax_mps = np.array(edge_vmax, dtype=np.float64)
+		self._routes_dirty = False
 
 	def add_train(self, train: Train) -> None:
+		# first occurrence wins, as route.index() did
+		train._node_to_idx = {}
+		for i, n in enumerate(train.route):
+			train._node_to_idx.setdefault(n, i)
 		self.trains[train.id] = train
+		self._routes_dirty = True
 
 	def reset(self) -> None:
 		for t in self.trains.values():
 			t.position = 0.0
 			t.current_edge = None
+			t.current_route_idx = 0
 			t.delay_min = 0
-			t.status = "stopped"
+			t.status = TrainStatus.STOPPED
 
 	async def start(self) -> None:
 		if self._running:
@@ -80,58 +189,86 @@ class RailwaySimulation:
 	async def stop(self) -> None:
 		self._running = False
 		if self._task:
-			await asyncio.wait([self._task])
+			# The loop only yields at its sleep, so cancelling never interrupts a tick halfway
+			self._task.cancel()
+			await asyncio.gather(self._task, return_exceptions=True)
+			self._task = None
 
 	async def _loop(self) -> None:
-		last_tick = time.time()
+		loop = asyncio.get_running_loop()
+		# Absolute schedule: tick n is due at start + n * minute_seconds, so step time does not accumulate as drift
+		next_tick = loop.time()
 		while self._running:
-			self._step_one_minute()
-			await self._updates.put({"type": "state", "data": self.state_snapshot()})
-			# throttle to minute_seconds
-			elapsed = time.time() - last_tick
-			sleep_for = max(0.0, self.minute_seconds - elapsed)
-			await asyncio.sleep(sleep_for)
-			last_tick = time.time()
+			next_tick += self.minute_seconds
+			decisions = self._step_one_minute()
+			# Changed trains only, with a full snapshot every FULL_STATE_EVERY minutes to resync clients
+			if self._ticks % FULL_STATE_EVERY == 0:
+				state = {"type": "state", "data": self.state_delta(full=True)}
+			else:
+				state = {"type": "delta", "data": self.state_delta()}
+			self._ticks += 1
+			# One queue item per minute: decisions (if any) travel with the state they produced
+			if decisions:
+				self.publish({"type": "batch", "msgs": [{"type": "decisions", "data": decision_labels(decisions)}, state]})
+			else:
+				self.publish(state)
+			now = loop.time()
+			if next_tick < now - self.minute_seconds:
+				# More than a tick behind (slow step, suspended process): resync rather than burst to catch up
+				next_tick = now
+			await asyncio.sleep(max(0.0, next_tick - now))
 
 	def _edge_length(self, u: str, v: str) -> float:
-		if not u or not v:
-			return 0.0
-		if self.graph.has_edge(u, v):
-			return float(self.graph[u][v][0].get("length", 0.0))
-		return 0.0
-
-	def _advance_train_position(self, t: Train) -> None:
-		# Initialize onto first edge if needed
-		if not t.current_edge:
-			if len(t.route) >= 2 and self.graph.has_edge(t.route[0], t.route[1]):
-				t.current_edge = (t.route[0], t.route[1])
+		return self._edge_len.get((u, v), 0.0)
+
+	def _advance_all_trains(self) -> None:
+		"""Advance every train by one simulated minute; the progress math runs over all trains as arrays."""
+		moving: List[Train] = []
+		for t in self.trains.values():
+			# Initialize onto first edge if needed
+			if not t.current_edge:
+				if len(t.route) >= 2 and (t.route[0], t.route[1]) in self._edge_len:
+					t.current_edge = (t.route[0], t.route[1])
+					t.current_route_idx = 0
+					t.position = 0.0
+					t.status = TrainStatus.RUNNING
+				else:
+					t.status = TrainStatus.STOPPED
+					continue
+			if self._edge_len.get(t.current_edge, 0.0) <= 0.0:
+				t.status = TrainStatus.STOPPED
+				continue
+			moving.append(t)
+		if not moving:
+			return
+		if self._routes_dirty:
+			self._pack_routes()
+		n = len(moving)
+		# current_edge is route[current_route_idx] -> route[current_route_idx + 1]: gather its data by flat index
+		flat_idx = np.fromiter((t._route_start + t.current_route_idx for t in moving), dtype=np.intp, count=n)
+		lengths = self._route_edge_len[flat_idx]
+		vmax_mps = self._route_edge_vmax_mps[flat_idx]
+		speeds = np.fromiter((t.speed_mps for t in moving), dtype=np.float64, count=n)
+		positions = np.fromiter((t.position for t in moving), dtype=np.float64, count=n)
+		done = _advance_kernel(positions, lengths, vmax_mps, speeds)
+		for t, pos in zip(moving, positions.tolist()):
+			t.position = pos
+		for i in np.flatnonzero(done).tolist():
+			self._enter_next_edge(moving[i])
+
+	def _enter_next_edge(self, t: Train) -> None:
+		"""Move a train that reached the end of its edge onto the next route edge, or stop it."""
+		idx = t._node_to_idx.get(t.current_edge[0], -1)
+		if idx >= 0 and idx + 2 < len(t.route):
+			next_u = t.route[idx + 1]
+			next_v = t.route[idx + 2]
+			if (next_u, next_v) in self._edge_len:
+				t.current_edge = (next_u, next_v)
+				t.current_route_idx = idx + 1
 				t.position = 0.0
-				t.status = "running"
-			else:
-				t.status = "stopped"
+				t.status = TrainStatus.RUNNING
 				return
-		u, v = t.current_edge
-		length = self._edge_length(u, v)
-		if length <= 0.0:
-			t.status = "stopped"
-			return
-		vmax_kmh = self.graph[u][v][0].get("max_speed")
-		vmax_mps = t.speed_mps if vmax_kmh is None else min(t.speed_mps, float(vmax_kmh) / 3.6)
-		# One simulated minute of progress
-		progress_m = max(0.0, vmax_mps) * 60.0
-		t.position = min(length, t.position + progress_m)
-		if t.position >= length - 1e-3:
-			# advance to next edge
-			idx = t.route.index(u) if u in t.route else -1
-			if idx >= 0 and idx + 2 < len(t.route):
-				next_u = t.route[idx + 1]
-				next_v = t.route[idx + 2]
-				if self.graph.has_edge(next_u, next_v):
-					t.current_edge = (next_u, next_v)
-					t.position = 0.0
-					t.status = "running"
-					return
-			t.status = "stopped"
+		t.status = TrainStatus.STOPPED
 
 	def _find_conflicts(self) -> List[Dict[str, Any]]:
 		"""Return conflicts where multiple trains want the same next edge.
@@ -141,7 +278,7 @@ class RailwaySimulation:
 		for t in self.trains.values():
 			if not t.current_edge:
 				# infer first planned edge
-				if len(t.route) >= 2 and self.graph.has_edge(t.route[0], t.route[1]):
+				if len(t.route) >= 2 and (t.route[0], t.route[1]) in self._edge_len:
 					edge = (t.route[0], t.route[1])
 					edge_to_trains.setdefault(edge, []).append(t.id)
 				continue
@@ -149,74 +286,98 @@ class RailwaySimulation:
 			length = self._edge_length(u, v)
 			if t.position >= length - 1e-3:
 				# intends to move to next edge
-				idx = t.route.index(u) if u in t.route else -1
+				idx = t._node_to_idx.get(u, -1)
 				if idx >= 0 and idx + 2 < len(t.route):
 					next_edge = (t.route[idx + 1], t.route[idx + 2])
-					if self.graph.has_edge(*next_edge):
+					if next_edge in self._edge_len:
 						edge_to_trains.setdefault(next_edge, []).append(t.id)
 		return [{"edge": e, "trains": tids} for e, tids in edge_to_trains.items() if len(tids) > 1]
 
-	def _apply_decisions(self, decisions: Dict[str, str]) -> None:
+	def _apply_decisions(self, decisions: Dict[Tuple[str, str], str]) -> None:
 		"""Apply optimizer decisions: hold non-winners for one minute (increase delay)."""
-		for key, winner in decisions.items():
-			_ = key  # key encodes edge; not needed for application
-			# all trains in that conflict except winner are delayed
-			edge_u, edge_v = key.split("->", 1)
-			for t in self.trains.values():
-				if not t.current_edge:
-					continue
-				u, v = t.current_edge
-				length = self._edge_length(u, v)
-				# only trains at end of edge trying to enter the contested segment
-				if t.position >= length - 1e-3:
-					idx = t.route.index(u) if u in t.route else -1
-					if idx >= 0 and idx + 2 < len(t.route):
-						nu = t.route[idx + 1]
-						nv = t.route[idx + 2]
-						if f"{nu}->{nv}" == key and t.id != winner:
-							# hold back for one minute
-							t.delay_min += 1
-							t.status = "held"
-							# do not advance to next edge this step (handled by position check)
-
-	def _step_one_minute(self) -> None:
+		if not decisions:
+			return
+		# all trains in a conflict except its winner are delayed
+		for t in self.trains.values():
+			if not t.current_edge:
+				continue
+			u, v = t.current_edge
+			length = self._edge_length(u, v)
+			# only trains at end of edge trying to enter the contested segment
+			if t.position >= length - 1e-3:
+				idx = t._node_to_idx.get(u, -1)
+				if idx >= 0 and idx + 2 < len(t.route):
+					winner = decisions.get((t.route[idx + 1], t.route[idx + 2]))
+					if winner is not None and t.id != winner:
+						# hold back for one minute
+						t.delay_min += 1
+						t.status = TrainStatus.HELD
+						# do not advance to next edge this step (handled by position check)
+
+	def publish(self, msg: Any) -> None:
+		"""Queue an update without awaiting; if the queue is full the oldest pending update is dropped."""
+		try:
+			self._updates.put_nowait(msg)
+		except asyncio.QueueFull:
+			self._updates.get_nowait()
+			self._updates.put_nowait(msg)
+
+	def _step_one_minute(self) -> Dict[Tuple[str, str], str]:
+		"""Advance the simulation one minute; returns the optimizer's decisions for the caller to broadcast."""
 		# 1) Determine conflicts about to happen
 		conflicts = self._find_conflicts()
-		decisions: Dict[str, str] = {}
+		decisions: Dict[Tuple[str, str], str] = {}
 		if conflicts:
 			decisions = self._optimizer.decide(conflicts, self.trains)
-			# broadcast decisions
-			asyncio.create_task(self._updates.put({"type": "decisions", "data": decisions}))
 			self._apply_decisions(decisions)
 		# 2) Advance all trains by one simulated minute
-		for t in self.trains.values():
-			prev_status = t.status
-			self._advance_train_position(t)
-			if prev_status == "held" and t.status == "running":
-				# clear held indicator after movement resumes
-				pass
+		self._advance_all_trains()
+		return decisions
+
+	def _state_row(self, t: Train) -> Dict[str, Any]:
+		u, v = t.current_edge if t.current_edge else (None, None)
+		length = self._edge_length(u, v) if u and v else 0.0
+		progress = 0.0 if length <= 0 else max(0.0, min(1.0, (t.position or 0.0) / length))
+		return {
+			"id": t.id,
+			"type": t.type,
+			"priority": t.priority,
+			"edge": {"u": u, "v": v} if u and v else None,
+			"position_m": round(t.position, 2),
+			"edge_length_m": round(length, 2),
+			"speed_mps": round(t.speed_mps, 2),
+			"status": t.status,
+			"progress": round(progress, 4),
+			"delay_min": t.delay_min,
+		}
 
 	def state_snapshot(self) -> Dict[str, Any]:
+		return {"trains": [self._state_row(t) for t in self.trains.values()]}
+
+	def state_delta(self, full: bool = False) -> Dict[str, Any]:
+		"""Rows only for trains whose state changed since the previous call (every train when ``full``).
+
+		A delta also lists under ``removed`` the ids sent earlier that are no longer simulated, so
+		clients merging by id can drop them.
+		"""
+		if full:
+			self._emitted.clear()
 		rows: List[Dict[str, Any]] = []
-		for t in self.trains.values():
-			u, v = t.current_edge if t.current_edge else (None, None)
-			length = self._edge_length(u, v) if u and v else 0.0
-			progress = 0.0 if length <= 0 else max(0.0, min(1.0, (t.position or 0.0) / length))
-			rows.append({
-				"id": t.id,
-				"type": t.type,
-				"priority": t.priority,
-				"edge": {"u": u, "v": v} if u and v else None,
-				"position_m": round(t.position, 2),
-				"edge_length_m": round(length, 2),
-				"speed_mps": round(t.speed_mps, 2),
-				"status": t.status,
-				"progress": round(progress, 4),
-				"delay_min": t.delay_min,
-			})
-		return {"trains": rows}
-
-	async def updates(self) -> "asyncio.Queue[Dict[str, Any]]":
+		emitted = self._emitted
+		trains = self.trains
+		for t in trains.values():
+			key = (t.current_edge, t.position, t.status, t.delay_min, t.speed_mps, t.priority, t.type)
+			if emitted.get(t.id) != key:
+				emitted[t.id] = key
+				rows.append(self._state_row(t))
+		if full:
+			return {"trains": rows}
+		removed = [tid for tid in emitted if tid not in trains]
+		for tid in removed:
+			del emitted[tid]
+		return {"trains": rows, "removed": removed}
+
+	async def updates(self) -> "asyncio.Queue[Any]":
 		return self._updates
 
 
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import itertools
+import json
 import math
 import os
 import random
@@ -8,6 +10,16 @@ from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 
 import folium
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; the kernel then runs as plain Python
+    def njit(*_args, **_kwargs):  # type: ignore[no-redef]
+        def wrap(fn):
+            return fn
+        return wrap
 
 
 # ------------------------------------------------------------
@@ -21,18 +33,70 @@ def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     la1 = math.radians(lat1)
     la2 = math.radians(lat2)
     h = math.sin(dlat / 2) ** 2 + math.cos(la1) * math.cos(la2) * math.sin(dlon / 2) ** 2
-    return 2 * R * math.atan2(math.sqrt(h), math.sqrt(1 - h))
+    # asin(sqrt(h)) == atan2(sqrt(h), sqrt(1 - h)) with one sqrt fewer; rounding can push h just past 1
+    return 2 * R * math.asin(math.sqrt(min(1.0, h)))
+
+
+def haversine_m_array(lats1: np.ndarray, lons1: np.ndarray, lats2: np.ndarray, lons2: np.ndarray) -> np.ndarray:
+    # element-wise haversine_m over arrays of points
+    R = 6371000.0
+    dlat = np.radians(lats2 - lats1)
+    dlon = np.radians(lons2 - lons1)
+    h = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lats1)) * np.cos(np.radians(lats2)) * np.sin(dlon / 2) ** 2
+    return 2 * R * np.arctan2(np.sqrt(h), np.sqrt(1 - h))
+
+
+# Longest segment (m) measured with equirectangular_m_array instead of the haversine; at this
+# length the flat-earth error is well under a millimetre
+EQUIRECT_MAX_SEG_M = 10_000.0
+_M_PER_DEG = 6371000.0 * math.pi / 180.0
+
+
+def equirectangular_m_array(lats1: np.ndarray, lons1: np.ndarray, lats2: np.ndarray, lons2: np.ndarray) -> np.ndarray:
+    # element-wise flat-earth distance, longitude scaled by the cosine of each segment's mid-latitude;
+    # one cos and a hypot instead of the haversine's trig
+    dx = (lons2 - lons1) * np.cos(np.radians((lats1 + lats2) * 0.5))
+    return _M_PER_DEG * np.hypot(dx, lats2 - lats1)
+
+
+def polyline_cum_lengths(coords: np.ndarray) -> np.ndarray:
+    # distance along the polyline at each vertex, from an (N, 2) lat/lon array; [0, ..., length]
+    if len(coords) < 2:
+        return np.zeros(len(coords))
+    seg = equirectangular_m_array(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+    if seg.max() > EQUIRECT_MAX_SEG_M:
+        seg = haversine_m_array(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+    return np.concatenate(([0.0], np.cumsum(seg)))
 
 
 def polyline_length_m(coords: List[Tuple[float, float]]) -> float:
     if len(coords) < 2:
         return 0.0
-    total = 0.0
-    for i in range(1, len(coords)):
-        a = coords[i - 1]
-        b = coords[i]
-        total += haversine_m(a[0], a[1], b[0], b[1])
-    return total
+    return float(polyline_cum_lengths(np.asarray(coords, dtype=np.float64))[-1])
+
+
+# Cached kernels pickle the importing module's name, so only cache under the importable one: a cache
+# written while this file runs as __main__ fails to load on a later import, and vice versa
+_CACHE_KERNELS = __name__ != "__main__"
+
+
+@njit(cache=_CACHE_KERNELS)
+def _interp_and_seg(coords: np.ndarray, cum: np.ndarray, s_m: float) -> Tuple[float, float, int]:
+    # (lat, lon, segment) at s_m along a polyline of >= 2 points: first segment whose end is at or past
+    # s_m, blended linearly; past the end, the last point and the last segment
+    n = coords.shape[0]
+    for i in range(n - 1):
+        if cum[i + 1] >= s_m:
+            d = cum[i + 1] - cum[i]
+            f = 0.0 if d <= 0 else (s_m - cum[i]) / d
+            lat = coords[i, 0] + (coords[i + 1, 0] - coords[i, 0]) * f
+            lon = coords[i, 1] + (coords[i + 1, 1] - coords[i, 1]) * f
+            return lat, lon, i
+    return coords[n - 1, 0], coords[n - 1, 1], n - 2
+
+
+# Compile (or load from cache) at import rather than on the first simulation step
+_interp_and_seg(np.zeros((2, 2)), np.array([0.0, 1.0]), 0.5)
 
 
 def interpolate_on_polyline(coords: List[Tuple[float, float]], target_m: float) -> Tuple[float, float]:
@@ -40,18 +104,14 @@ def interpolate_on_polyline(coords: List[Tuple[float, float]], target_m: float)
         raise ValueError("no coordinates")
     if len(coords) == 1:
         return coords[0]
-    acc = 0.0
-    for i in range(1, len(coords)):
-        a = coords[i - 1]
-        b = coords[i]
-        d = haversine_m(a[0], a[1], b[0], b[1])
-        if acc + d >= target_m:
-            f = 0.0 if d <= 0 else (target_m - acc) / d
-            lat = a[0] + (b[0] - a[0]) * f
-            lon = a[1] + (b[1] - a[1]) * f
-            return (lat, lon)
-        acc += d
-    return coords[-1]
+    arr = np.asarray(coords, dtype=np.float64)
+    lat, lon, _ = _interp_and_seg(arr, polyline_cum_lengths(arr), target_m)
+    return (lat, lon)
+
+
+# Trains on one route from which Simulator.step interpolates them with one NumPy batch; below
+# this, per-train kernel calls are cheaper than the fixed cost of the array operations
+BATCH_INTERP_MIN = 48
 
 
 # ------------------------------------------------------------
@@ -64,22 +124,44 @@ class Route:
     name: str
     coordinates: List[Tuple[float, float]]  # (lat, lon)
     length_m: float = field(init=False)
+    # cumulative arc length at each coordinate, computed once; cum[-1] == length_m
+    cum_m: np.ndarray = field(init=False, repr=False, compare=False)
+    # coordinates as a contiguous (N, 2) float64 array for the geometry code; `coordinates` stays
+    # the list folium serializes
+    coords_np: np.ndarray = field(init=False, repr=False, compare=False)
 
     def __post_init__(self) -> None:
-        self.length_m = polyline_length_m(self.coordinates)
+        self.coords_np = np.ascontiguousarray(self.coordinates, dtype=np.float64).reshape(-1, 2)
+        self.cum_m = polyline_cum_lengths(self.coords_np)
+        self.length_m = float(self.cum_m[-1]) if len(self.coordinates) >= 2 else 0.0
 
     def segment_index_at_distance(self, s_m: float) -> int:
-        if s_m <= 0:
+        if s_m <= 0 or len(self.coordinates) < 2:
             return 0
-        acc = 0.0
-        for i in range(1, len(self.coordinates)):
-            a = self.coordinates[i - 1]
-            b = self.coordinates[i]
-            d = haversine_m(a[0], a[1], b[0], b[1])
-            if acc + d >= s_m:
-                return i - 1
-            acc += d
-        return max(0, len(self.coordinates) - 2)
+        return _interp_and_seg(self.coords_np, self.cum_m, s_m)[2]
+
+    def point_at_distance(self, s_m: float) -> Tuple[float, float]:
+        # interpolate_on_polyline over this route, reusing the cached arc lengths
+        if len(self.coordinates) < 2:
+            return interpolate_on_polyline(self.coordinates, s_m)
+        lat, lon, _ = _interp_and_seg(self.coords_np, self.cum_m, s_m)
+        return (lat, lon)
+
+    def interpolate_batch(self, s_arr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # point_at_distance for many distances along this route (>= 2 points) in one pass
+        n = len(self.coordinates)
+        cum = self.cum_m
+        idx = np.searchsorted(cum[1:], s_arr, side="left")
+        past_end = idx >= n - 1
+        idx = np.minimum(idx, n - 2)
+        d = cum[idx + 1] - cum[idx]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            f = np.where(d <= 0, 0.0, (s_arr - cum[idx]) / d)
+        a = self.coords_np[idx]
+        b = self.coords_np[idx + 1]
+        lats = np.where(past_end, self.coords_np[-1, 0], a[:, 0] + (b[:, 0] - a[:, 0]) * f)
+        lons = np.where(past_end, self.coords_np[-1, 1], a[:, 1] + (b[:, 1] - a[:, 1]) * f)
+        return lats, lons
 
 
 @dataclass
@@ -117,30 +199,24 @@ class Train:
 class Simulator:
     def __init__(self, routes: Dict[str, Route], trains: List[Train], window_minutes: float = 30.0, tick_s: float = 2.0):
         self.routes = routes
-        self.trains = trains
+        # ordered by start time (stable, so equal starts keep the caller's order); trains[:_next_start_i]
+        # are the ones whose start time has passed, the rest are never looked at
+        self.trains = sorted(trains, key=lambda t: t.start_s)
+        self._next_start_i = 0
+        # before the first start nothing is on the map; after the last end no train can move again
+        self._min_start = min((t.start_s for t in trains), default=0.0)
+        self._max_end = max((t.end_s for t in trains), default=0.0)
         self.window_s = window_minutes * 60.0
         self.tick_s = tick_s
         self.time_s = 0.0
-        # precompute route segment cumulative lengths for occupancy checks
-        self._route_segments: Dict[str, List[Tuple[float, float]]] = {}
-        for r in routes.values():
-            self._route_segments[r.name] = self._compute_segment_cum_lengths(r.coordinates)
-
-    @staticmethod
-    def _compute_segment_cum_lengths(coords: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
-        # returns list of (start_m, end_m) for each segment index i=0..n-2
-        out: List[Tuple[float, float]] = []
-        acc = 0.0
-        for i in range(1, len(coords)):
-            a = coords[i - 1]
-            b = coords[i]
-            d = haversine_m(a[0], a[1], b[0], b[1])
-            out.append((acc, acc + d))
-            acc += d
-        return out
 
     def _active_trains(self) -> List[Train]:
-        return [t for t in self.trains if (t.start_s <= self.time_s <= t.end_s) and not t.finished]
+        trains = self.trains
+        i = self._next_start_i
+        while i < len(trains) and trains[i].start_s <= self.time_s:
+            i += 1
+        self._next_start_i = i
+        return [t for t in trains[:i] if self.time_s <= t.end_s and not t.finished]
 
     def _advance_train(self, t: Train) -> None:
         if self.time_s < t.start_s:
@@ -158,21 +234,25 @@ class Simulator:
     def _segment_index(self, t: Train) -> int:
         return t.route.segment_index_at_distance(t.cur_s)
 
-    def _detect_conflicts(self) -> List[Tuple[Train, Train]]:
+    def _detect_conflicts(self, active: List[Train]) -> List[Tuple[Train, Train]]:
         # conflict if two trains on same route and same segment, progressing in any direction
+        # group active trains by route, then by segment within routes that have more than one train;
+        # a train alone on its route never needs its segment looked up.
+        # Groups keep self.trains order, so pairs come out as (earlier, later) like a nested loop would.
+        by_route: Dict[str, List[Train]] = {}
+        for t in active:
+            if not t.finished:
+                by_route.setdefault(t.route.name, []).append(t)
         conflicts: List[Tuple[Train, Train]] = []
-        for i in range(len(self.trains)):
-            a = self.trains[i]
-            if a.finished or not (a.start_s <= self.time_s <= a.end_s):
+        for group in by_route.values():
+            if len(group) < 2:
                 continue
-            for j in range(i + 1, len(self.trains)):
-                b = self.trains[j]
-                if b.finished or not (b.start_s <= self.time_s <= b.end_s):
-                    continue
-                if a.route.name != b.route.name:
-                    continue
-                if self._segment_index(a) == self._segment_index(b):
-                    conflicts.append((a, b))
+            by_seg: Dict[int, List[Train]] = {}
+            for t in group:
+                by_seg.setdefault(self._segment_index(t), []).append(t)
+            for same_seg in by_seg.values():
+                if len(same_seg) >= 2:
+                    conflicts.extend(itertools.combinations(same_seg, 2))
         return conflicts
 
     def _resolve_conflicts(self, conflicts: List[Tuple[Train, Train]]) -> None:
@@ -187,20 +267,43 @@ class Simulator:
             # back off progress slightly to avoid overlap illusion
             victim.cur_s = max(0.0, victim.cur_s - victim.speed_mps * 0.25)
 
+    @staticmethod
+    def _points_on_routes(trains: List[Train]) -> List[Tuple[float, float]]:
+        # (lat, lon) of each train; routes carrying many trains are interpolated in one batch
+        by_route: Dict[str, List[int]] = {}
+        for i, t in enumerate(trains):
+            by_route.setdefault(t.route.name, []).append(i)
+        points: List[Tuple[float, float]] = [(0.0, 0.0)] * len(trains)
+        for idxs in by_route.values():
+            route = trains[idxs[0]].route
+            if len(idxs) >= BATCH_INTERP_MIN and len(route.coordinates) >= 2:
+                s_arr = np.fromiter((trains[i].cur_s for i in idxs), dtype=np.float64, count=len(idxs))
+                lats, lons = route.interpolate_batch(s_arr)
+                for i, lat, lon in zip(idxs, lats.tolist(), lons.tolist()):
+                    points[i] = (lat, lon)
+            else:
+                for i in idxs:
+                    points[i] = route.point_at_distance(trains[i].cur_s)
+        return points
+
     def step(self) -> Dict[str, Dict[str, float]]:
-        # advance active trains
-        for t in self._active_trains():
-            self._advance_train(t)
-        # detect conflicts and adjust
-        conflicts = self._detect_conflicts()
-        if conflicts:
-            self._resolve_conflicts(conflicts)
+        if self.time_s < self._min_start:
+            self.time_s += self.tick_s
+            return {}
+        if self.time_s <= self._max_end:
+            # advance active trains; the same list (less any that just finished) is checked for conflicts
+            active = self._active_trains()
+            for t in active:
+                self._advance_train(t)
+            # detect conflicts and adjust
+            conflicts = self._detect_conflicts(active)
+            if conflicts:
+                self._resolve_conflicts(conflicts)
         # build telemetry
+        visible = [t for t in self.trains[:self._next_start_i] if (t.start_s <= self.time_s <= t.end_s) or t.finished]
+        points = self._points_on_routes(visible)
         positions: Dict[str, Dict[str, float]] = {}
-        for t in self.trains:
-            if not (t.start_s <= self.time_s <= t.end_s) and not t.finished:
-                continue
-            lat, lon = interpolate_on_polyline(t.route.coordinates, t.cur_s)
+        for t, (lat, lon) in zip(visible, points):
             positions[t.train_id] = {
                 "lat": lat,
                 "lon": lon,
@@ -223,6 +326,11 @@ class FoliumRenderer:
         self.center_lat = center_lat
         self.center_lon = center_lon
         self.zoom_start = zoom_start
+        # render_frame's page, rendered once per set of routes: (route names, head, tail, map variable),
+        # head and tail already encoded
+        self._frame_template: Optional[Tuple[Tuple[str, ...], bytes, bytes, str]] = None
+        # reused by every render_frame call
+        self._buf = bytearray()
 
     @staticmethod
     def _color_for(name: str) -> str:
@@ -234,27 +342,112 @@ class FoliumRenderer:
         idx = (sum(ord(c) for c in name) % len(colors))
         return colors[idx]
 
-    def render_frame(self, routes: Dict[str, Route], trains: List[Train], positions: Dict[str, Dict[str, float]], out_html: str) -> None:
+    def render_base(self, routes: Dict[str, Route], trains: List[Train], out_html: str, tick_s: float = 2.0) -> None:
+        # Static part, written once: tiles, route polylines and a small client that loads
+        # positions_00000.json, positions_00001.json, ... from the same directory and moves one
+        # marker per train. Browsers block fetch() on file:// URLs, so serve the output directory
+        # (e.g. `python -m http.server`) and open base.html from there.
+        m = self._route_map(routes)
+        colors = {t.train_id: t.color for t in trains}
+        client = _POSITIONS_CLIENT_JS % {
+            "map": m.get_name(),
+            "colors": json.dumps(colors, separators=(",", ":")),
+            "tick_ms": max(50, int(tick_s * 1000)),
+        }
+        m.get_root().script.add_child(folium.Element(client))
+        m.save(out_html)
+
+    def _route_map(self, routes: Dict[str, Route]) -> folium.Map:
         m = folium.Map(location=[self.center_lat, self.center_lon], zoom_start=self.zoom_start, control_scale=True, tiles="OpenStreetMap")
         # draw polylines for each route
         for rname, route in routes.items():
             folium.PolyLine(route.coordinates, color=self._color_for(rname), weight=4, opacity=0.8, tooltip=f"Route {rname}").add_to(m)
-        # draw train markers
+        return m
+
+    def render_frame(self, routes: Dict[str, Route], trains: List[Train], positions: Dict[str, Dict[str, float]], out_html: str) -> None:
+        # Self-contained page for one tick (opens from file://, unlike base.html). folium renders the
+        # map and routes once; each frame splices marker JS into that HTML instead of walking the
+        # whole element tree again.
+        names = tuple(routes)
+        if self._frame_template is None or self._frame_template[0] != names:
+            m = self._route_map(routes)
+            m.get_root().script.add_child(folium.Element(_MARKERS_SENTINEL))
+            head, tail = m.get_root().render().split(_MARKERS_SENTINEL, 1)
+            self._frame_template = (names, head.encode("utf-8"), tail.encode("utf-8"), m.get_name())
+        _, head, tail, map_name = self._frame_template
+        buf = self._buf
+        buf.clear()
+        buf += head
+        # folium emits custom scripts ahead of the map variable, so the markers wait for DOMContentLoaded
+        buf += b'document.addEventListener("DOMContentLoaded",function(){'
         for t in trains:
             pos = positions.get(t.train_id)
             if not pos:
                 continue
-            popup = folium.Popup(html=f"<b>{t.train_id}</b><br>speed={pos['speed_mps']:.1f} m/s<br>progress={pos['progress']*100:.1f}%", max_width=250)
-            folium.CircleMarker(
-                location=(pos["lat"], pos["lon"]),
-                radius=6,
-                color=t.color,
-                fill=True,
-                fill_color=t.color,
-                fill_opacity=0.95,
-                popup=popup,
-            ).add_to(m)
-        m.save(out_html)
+            popup = f"<b>{t.train_id}</b><br>speed={pos['speed_mps']:.1f} m/s<br>progress={pos['progress']*100:.1f}%"
+            color = json.dumps(t.color)
+            buf += (
+                f"L.circleMarker([{pos['lat']!r},{pos['lon']!r}],{{radius:6,color:{color},fill:true,fillColor:{color},fillOpacity:0.95}})"
+                f".bindPopup({json.dumps(popup)},{{maxWidth:250}}).addTo({map_name});"
+            ).encode("utf-8")
+        buf += b"});"
+        buf += tail
+        with open(out_html, "wb") as f:
+            f.write(buf)
+
+    @staticmethod
+    def render_positions(positions: Dict[str, Dict[str, float]], out_json: str) -> None:
+        # Per-tick part: just the positions, as compact JSON
+        with open(out_json, "w", encoding="utf-8") as f:
+            json.dump(positions, f, separators=(",", ":"))
+
+
+# Placeholder rendered into render_frame's template where the per-frame markers go
+_MARKERS_SENTINEL = "/*__TRAIN_MARKERS__*/"
+
+# Loaded by the page render_base writes. Runs on DOMContentLoaded so the map variable folium
+# defines later in the same script block already exists.
+_POSITIONS_CLIENT_JS = """
+document.addEventListener("DOMContentLoaded", function () {
+    var map = %(map)s;
+    var colors = %(colors)s;
+    var tickMs = %(tick_ms)d;
+    var markers = {};
+    var step = 0;
+    function popupHtml(id, p) {
+        return "<b>" + id + "</b><br>speed=" + p.speed_mps.toFixed(1) + " m/s<br>progress=" + (p.progress * 100).toFixed(1) + "%%";
+    }
+    function apply(positions) {
+        for (var id in markers) {
+            if (!(id in positions)) {
+                map.removeLayer(markers[id]);
+                delete markers[id];
+            }
+        }
+        for (var tid in positions) {
+            var p = positions[tid];
+            var marker = markers[tid];
+            if (!marker) {
+                var c = colors[tid] || "black";
+                marker = markers[tid] = L.circleMarker([p.lat, p.lon], {radius: 6, color: c, fill: true, fillColor: c, fillOpacity: 0.95})
+                    .bindPopup("", {maxWidth: 250})
+                    .addTo(map);
+            } else {
+                marker.setLatLng([p.lat, p.lon]);
+            }
+            marker.setPopupContent(popupHtml(tid, p));
+        }
+    }
+    function next() {
+        fetch("positions_" + String(step).padStart(5, "0") + ".json", {cache: "no-store"})
+            .then(function (r) { if (!r.ok) { throw r; } return r.json(); })
+            .then(function (positions) { apply(positions); step += 1; setTimeout(next, tickMs); })
+            // not written yet (live run) or past the last frame: try the same step again later
+            .catch(function () { setTimeout(next, tickMs); });
+    }
+    next();
+});
+"""
 
 
 # ------------------------------------------------------------
@@ -339,7 +532,7 @@ def build_trains(routes: Dict[str, Route]) -> List[Train]:
     return trains
 
 
-def run_simulation(output_dir: str = "folium_frames", minutes: float = 30.0, tick_s: float = 2.0, realtime: bool = False) -> None:
+def run_simulation(output_dir: str = "folium_frames", minutes: float = 30.0, tick_s: float = 2.0, realtime: bool = False, html_frames: bool = False) -> None:
     routes = build_dummy_routes()
     trains = build_trains(routes)
     # center near New Delhi
@@ -348,15 +541,21 @@ def run_simulation(output_dir: str = "folium_frames", minutes: float = 30.0, tic
     sim = Simulator(routes, trains, window_minutes=minutes, tick_s=tick_s)
 
     os.makedirs(output_dir, exist_ok=True)
+    # routes never change: the map is rendered once, each tick only writes positions
+    renderer.render_base(routes, trains, os.path.join(output_dir, "base.html"), tick_s=tick_s)
     total_steps = int((minutes * 60.0) / tick_s)
     for step in range(total_steps + 1):
         positions = sim.step()
-        out_file = os.path.join(output_dir, f"frame_{step:05d}.html")
-        renderer.render_frame(routes, trains, positions, out_file)
+        out_file = os.path.join(output_dir, f"positions_{step:05d}.json")
+        renderer.render_positions(positions, out_file)
+        if html_frames:
+            # standalone page per tick as well, for viewing without a web server
+            renderer.render_frame(routes, trains, positions, os.path.join(output_dir, f"frame_{step:05d}.html"))
         if realtime:
             time.sleep(tick_s)
 
-    print(f"Generated {total_steps + 1} frames in '{output_dir}'. Open the latest HTML to view.")
+    print(f"Generated base.html and {total_steps + 1} position frames in '{output_dir}'. "
+          f"Serve it (python -m http.server --directory {output_dir}) and open base.html to view.")
 
 
 if __name__ == "__main__":
@@ -13,6 +13,24 @@ import {
   Cog6ToothIcon,
 } from '@heroicons/react/24/outline'
 
+// Compact telemetry (schema v2 from rt_simulation.AsyncSimulation.telemetry_rows):
+// [train_id, priority, u, v, position_m, edge_length_m, speed_mps, status, progress] per train
+const PRIORITY_NAMES = ['express', 'passenger', 'freight']
+const STATUS_NAMES = ['running', 'stopped', 'delayed', 'held']
+
+function unpackTelemetryV2(rows) {
+	return rows.map(([trainId, prio, u, v, positionM, edgeLengthM, speedMps, status, progress]) => ({
+		train_id: trainId,
+		priority: PRIORITY_NAMES[prio] ?? 'unknown',
+		edge: u != null && v != null ? { u, v } : null,
+		position_m: positionM,
+		edge_length_m: edgeLengthM,
+		speed_mps: speedMps,
+		status: STATUS_NAMES[status] ?? 'unknown',
+		progress,
+	}))
+}
+
 function FitBounds({ bbox }) {
 	const map = useMap()
 	useEffect(() => {
@@ -87,14 +105,18 @@ export default function RailwayDashboard() {
 	useEffect(() => {
 		let cancelled = false
 		let timer
+		let haveRoutes = false
 		async function poll() {
 			try {
-				const res = await fetch('http://localhost:8000/train_positions', { cache: 'no-store' })
+				// Routes never change: fetch them with the first successful poll, then positions only
+				const url = 'http://localhost:8000/train_positions' + (haveRoutes ? '?include_routes=false' : '')
+				const res = await fetch(url, { cache: 'no-store' })
 				const json = await res.json()
 				if (!cancelled && json && json.success) {
 					setLivePositions(json.data || [])
-					if (json.routes) {
+					if (json.routes && json.routes.length) {
 						setTrainRoutes(json.routes)
+						haveRoutes = true
 					}
 				}
 			} catch (e) {
@@ -141,48 +163,64 @@ export default function RailwayDashboard() {
 				ws.onmessage = (ev) => {
 					if (cancelled) return
 					try {
-						const msg = JSON.parse(ev.data)
-						if (msg.type === 'state' && msg.data && msg.data.trains) {
-							const data = msg.data.trains
-							const ts = performance.now()
-							lastTelemetryRef.current = { data, ts }
-							setTelemetry(data)
-							setLastUpdateMs(ts)
-						}
-						if (msg.type === 'alerts' && Array.isArray(msg.data)) {
-							// Merge new alerts into existing list; keep old ones until user dismisses
-							const makeKey = (a) => {
-								const p = a && a.pair ? a.pair : { a: '', b: '' }
-								const s1 = String(p.a || '')
-								const s2 = String(p.b || '')
-								return [s1, s2].sort().join('|')
+						const parsed = JSON.parse(ev.data)
+						// Server coalesces bursts into one {type:'batch', msgs:[...]} frame
+						const msgs = parsed.type === 'batch' && Array.isArray(parsed.msgs) ? parsed.msgs : [parsed]
+						for (const msg of msgs) {
+							if (msg.type === 'state' && msg.data && msg.data.trains) {
+								const data = msg.data.v === 2 ? unpackTelemetryV2(msg.data.trains) : msg.data.trains
+								const ts = performance.now()
+								lastTelemetryRef.current = { data, ts }
+								setTelemetry(data)
+								setLastUpdateMs(ts)
 							}
-							const incomingByKey = new Map()
-							for (const a of msg.data) {
-								const k = makeKey(a)
-								if (!dismissedAlertKeys.has(k)) incomingByKey.set(k, a)
+							if (msg.type === 'delta' && msg.data && msg.data.trains) {
+								// Only trains that changed since the last frame: merge by id into the current list,
+								// dropping trains the simulation no longer has
+								const byId = new Map(lastTelemetryRef.current.data.map(t => [t.id, t]))
+								for (const id of msg.data.removed || []) byId.delete(id)
+								for (const t of msg.data.trains) byId.set(t.id, t)
+								const data = Array.from(byId.values())
+								const ts = performance.now()
+								lastTelemetryRef.current = { data, ts }
+								setTelemetry(data)
+								setLastUpdateMs(ts)
 							}
-							setAlerts(prev => {
-								const prevByKey = new Map(prev.map(a => [makeKey(a), a]))
-								// Update or add incoming
-								for (const [k, a] of incomingByKey.entries()) {
-									prevByKey.set(k, a)
+							if (msg.type === 'alerts' && Array.isArray(msg.data)) {
+								// Merge new alerts into existing list; keep old ones until user dismisses
+								const makeKey = (a) => {
+									const p = a && a.pair ? a.pair : { a: '', b: '' }
+									const s1 = String(p.a || '')
+									const s2 = String(p.b || '')
+									return [s1, s2].sort().join('|')
+								}
+								const incomingByKey = new Map()
+								for (const a of msg.data) {
+									const k = makeKey(a)
+									if (!dismissedAlertKeys.has(k)) incomingByKey.set(k, a)
 								}
-								// Keep previously existing alerts (even if not in incoming) unless dismissed
-								const merged = Array.from(prevByKey.values())
-								// Optional: sort by severity then distance
-								merged.sort((x, y) => {
-									const sv = (s) => s === 'critical' ? 2 : s === 'warn' ? 1 : 0
-									const aS = sv(x.severity), bS = sv(y.severity)
-									if (bS !== aS) return bS - aS
-									return (x.distance_m || 0) - (y.distance_m || 0)
+								setAlerts(prev => {
+									const prevByKey = new Map(prev.map(a => [makeKey(a), a]))
+									// Update or add incoming
+									for (const [k, a] of incomingByKey.entries()) {
+										prevByKey.set(k, a)
+									}
+									// Keep previously existing alerts (even if not in incoming) unless dismissed
+									const merged = Array.from(prevByKey.values())
+									// Optional: sort by severity then distance
+									merged.sort((x, y) => {
+										const sv = (s) => s === 'critical' ? 2 : s === 'warn' ? 1 : 0
+										const aS = sv(x.severity), bS = sv(y.severity)
+										if (bS !== aS) return bS - aS
+										return (x.distance_m || 0) - (y.distance_m || 0)
+									})
+									return merged
 								})
-								return merged
-							})
-							const critical = msg.data.find(a => a.severity === 'critical' && !dismissedAlertKeys.has(makeKey(a)))
-							if (critical) {
-								setLastCritical({ ts: Date.now(), alert: critical })
-								setDismissedCritical(false) // Reset dismissed state for new critical alerts
+								const critical = msg.data.find(a => a.severity === 'critical' && !dismissedAlertKeys.has(makeKey(a)))
+								if (critical) {
+									setLastCritical({ ts: Date.now(), alert: critical })
+									setDismissedCritical(false) // Reset dismissed state for new critical alerts
+								}
 							}
 						}
 					} catch {}
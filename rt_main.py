@@ -1,5 +1,5 @@
 import asyncio
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple, Union
 from contextlib import asynccontextmanager
 
 import networkx as nx
@@ -127,49 +127,85 @@ async def post_optimize(body: Dict[str, Any] | None = None) -> Dict[str, Any]:
 async def ws_updates(ws: WebSocket) -> None:
 	await ws.accept()
 	try:
-		queue = await sim.updates()
-		while True:
-			msg = await queue.get()
+		async for msg in sim.updates():
 			await ws.send_json(msg)
 	except WebSocketDisconnect:
 		return
 
 
 # --- OSM API v0.6 integration helpers ---
+import io
+import time
+from collections import OrderedDict
 import requests
 import xml.etree.ElementTree as ET
 
-
-def _parse_osm_map_xml(xml_text: str) -> Dict[str, Any]:
-	root = ET.fromstring(xml_text)
+# One pooled session for every /network_osm call, so repeated polling reuses the TCP/TLS connection
+# (requests already asks for gzip/deflate and decompresses transparently)
+_osm_session = requests.Session()
+_osm_session.headers.update({'User-Agent': 'railway-sim/1.0'})
+# Parsed /network_osm results by bbox; OSM data changes far slower than clients poll
+OSM_CACHE_TTL_S = 300.0
+# bboxes kept at once; least recently used beyond this are dropped
+OSM_CACHE_MAX_ENTRIES = 32
+_osm_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def _osm_cache_put(bbox: str, data: Dict[str, Any]) -> None:
+	now = time.monotonic()
+	for key in [k for k, (ts, _) in _osm_cache.items() if now - ts >= OSM_CACHE_TTL_S]:
+		del _osm_cache[key]
+	_osm_cache[bbox] = (now, data)
+	_osm_cache.move_to_end(bbox)
+	while len(_osm_cache) > OSM_CACHE_MAX_ENTRIES:
+		_osm_cache.popitem(last=False)
+
+
+def _parse_osm_map_xml(xml_text: Union[str, bytes]) -> Dict[str, Any]:
+	# stream the document: each node/way is handled as soon as it is closed and then dropped from
+	# the root, so only the compact dicts below are kept rather than the whole element tree
+	if isinstance(xml_text, str):
+		xml_text = xml_text.encode('utf-8')
 	node_by_id: Dict[str, Dict[str, Any]] = {}
-	for n in root.findall('node'):
-		nid = n.get('id')
-		lat = n.get('lat')
-		lon = n.get('lon')
-		tags: Dict[str, str] = {}
-		for t in n.findall('tag'):
-			tags[t.get('k') or ''] = t.get('v') or ''
-		node_by_id[nid] = {'id': nid, 'lat': float(lat) if lat else None, 'lon': float(lon) if lon else None, 'tags': tags}
+	# (node refs, maxspeed) of railway ways, resolved once every node is known
+	rail_ways: List[Tuple[List[str], Optional[str]]] = []
+	root = None
+	for event, elem in ET.iterparse(io.BytesIO(xml_text), events=('start', 'end')):
+		if event == 'start':
+			if root is None:
+				root = elem
+			continue
+		if elem.tag == 'node':
+			nid = elem.get('id')
+			lat = elem.get('lat')
+			lon = elem.get('lon')
+			tags: Dict[str, str] = {}
+			for t in elem.iter('tag'):
+				tags[t.get('k') or ''] = t.get('v') or ''
+			node_by_id[nid] = {'id': nid, 'lat': float(lat) if lat else None, 'lon': float(lon) if lon else None, 'tags': tags}
+		elif elem.tag == 'way':
+			tags = {}
+			for t in elem.iter('tag'):
+				tags[t.get('k') or ''] = t.get('v') or ''
+			if tags.get('railway') == 'rail':
+				rail_ways.append(([nd.get('ref') for nd in elem.iter('nd')], tags.get('maxspeed')))
+		else:
+			continue
+		root.clear()
 	nodes: List[Dict[str, Any]] = []
 	for nid, data in node_by_id.items():
 		rtag = data['tags'].get('railway')
 		if rtag in ('station','halt','signal'):
 			nodes.append({'id': nid, 'type': 'station' if rtag in ('station','halt') else 'signal', 'lat': data['lat'], 'lon': data['lon'], 'name': data['tags'].get('name')})
 	edges: List[Dict[str, Any]] = []
-	for w in root.findall('way'):
-		tags: Dict[str, str] = {}
-		for t in w.findall('tag'):
-			tags[t.get('k') or ''] = t.get('v') or ''
-		if tags.get('railway') != 'rail':
-			continue
-		nds = [nd.get('ref') for nd in w.findall('nd') if nd.get('ref') in node_by_id]
+	for refs, max_speed in rail_ways:
+		nds = [ref for ref in refs if ref in node_by_id]
 		if len(nds) < 2:
 			continue
 		for i in range(len(nds)-1):
 			u = nds[i]; v = nds[i+1]
 			if node_by_id.get(u) and node_by_id.get(v):
-				edges.append({'source': u, 'target': v, 'length': None, 'max_speed': tags.get('maxspeed')})
+				edges.append({'source': u, 'target': v, 'length': None, 'max_speed': max_speed})
 	present = {n['id'] for n in nodes}
 	for e in edges:
 		for nid in (e['source'], e['target']):
@@ -181,6 +217,13 @@ def _parse_osm_map_xml(xml_text: str) -> Dict[str, Any]:
 	return {'nodes': nodes, 'edges': edges}
 
 
+def _fetch_osm_map(url: str) -> Dict[str, Any]:
+	# blocking download + parse, run off the event loop by network_osm
+	r = _osm_session.get(url, timeout=60)
+	r.raise_for_status()
+	return _parse_osm_map_xml(r.content)
+
+
 @app.get('/network_osm')
 async def network_osm(bbox: str = '') -> Dict[str, Any]:
 	"""Fetch live OSM data via API v0.6 map endpoint and adapt it.
@@ -189,10 +232,13 @@ async def network_osm(bbox: str = '') -> Dict[str, Any]:
 	try:
 		if not bbox:
 			bbox = '77.21,28.64,77.23,28.65'
+		cached = _osm_cache.get(bbox)
+		if cached is not None and time.monotonic() - cached[0] < OSM_CACHE_TTL_S:
+			_osm_cache.move_to_end(bbox)
+			return {'success': True, **cached[1]}
 		url = f'https://api.openstreetmap.org/api/0.6/map?bbox={bbox}'
-		r = requests.get(url, timeout=60)
-		r.raise_for_status()
-		data = _parse_osm_map_xml(r.text)
+		data = await asyncio.to_thread(_fetch_osm_map, url)
+		_osm_cache_put(bbox, data)
 		return {'success': True, **data}
 	except Exception as e:
 		return {'success': False, 'error': str(e)}
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import asyncio
+import math
 import time
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import networkx as nx
 from ortools.sat.python import cp_model
@@ -39,6 +40,7 @@ class Train:
 	planned_arrival_s: float = 0.0
 	# dynamic
 	position_edge: Tuple[str, str] | None = None
+	path_index: int = 0  # index in path_nodes of position_edge[0]
 	position_m: float = 0.0
 	speed_mps: float = 0.0
 	status: str = "stopped"  # running|stopped|delayed|held
@@ -61,12 +63,47 @@ class Event:
 	timestamp_ms: int = field(default_factory=now_ms)
 
 
+# Train positions are compared in buckets of this many metres when deciding whether to re-solve
+PLAN_POSITION_BUCKET_M = 10.0
+
+
 class Optimizer:
 	"""Simple CP-SAT precedence optimizer over segment occupancy windows.
 	This models each edge traversal as an interval; adds no-overlap per edge.
 	"""
 
+	def __init__(self) -> None:
+		# signature of the inputs behind _last_plan; an unchanged signature reuses the plan
+		self._last_sig: Optional[Tuple[Any, ...]] = None
+		self._last_plan: Optional[Dict[str, Any]] = None
+
+	@staticmethod
+	def _plan_signature(graph: nx.MultiDiGraph, trains: List[Train], horizon_s: float) -> Tuple[Any, ...]:
+		"""Everything build_and_solve reads, with positions quantized to PLAN_POSITION_BUCKET_M."""
+		return (id(graph), horizon_s) + tuple(sorted(
+			(
+				t.train_id,
+				t.priority,
+				t.position_edge,
+				# before a train is placed, its first edge comes from the path
+				tuple(t.path_nodes[:2]) if not t.position_edge else None,
+				int(t.position_m // PLAN_POSITION_BUCKET_M),
+				round(t.max_speed_mps, 1),
+				round(t.planned_departure_s, 1),
+			)
+			for t in trains
+		))
+
 	def build_and_solve(self, graph: nx.MultiDiGraph, trains: List[Train], tick_s: float, horizon_s: float = 3600.0) -> Dict[str, Any]:
+		sig = self._plan_signature(graph, trains, horizon_s)
+		if sig == self._last_sig and self._last_plan is not None:
+			return self._last_plan
+		plan = self._build_and_solve(graph, trains, tick_s, horizon_s)
+		self._last_sig = sig
+		self._last_plan = plan
+		return plan
+
+	def _build_and_solve(self, graph: nx.MultiDiGraph, trains: List[Train], tick_s: float, horizon_s: float) -> Dict[str, Any]:
 		model = cp_model.CpModel()
 		assignments: Dict[Tuple[str, str, str], Tuple[cp_model.IntVar, cp_model.IntervalVar]] = {}
 
@@ -113,17 +150,25 @@ class Optimizer:
 			model.AddNoOverlap(ivs)
 
 		# Objective: minimize sum of starts (earlier traversal) and soft priority
-		obj_terms: List[cp_model.LinearExpr] = []
+		# weight per train id, computed once (first train with an id wins, as a scan would); compared
+		# with == rather than hashed so plain "express"/"passenger" strings still match the enum
+		prio_by_id: Dict[str, int] = {}
+		for t in trains:
+			if t.train_id not in prio_by_id:
+				prio_by_id[t.train_id] = 1 if t.priority == TrainPriority.EXPRESS else 5 if t.priority == TrainPriority.PASSENGER else 10
+		# one WeightedSum instead of a Python-level chain of s * prio additions
+		starts: List[cp_model.IntVar] = []
+		weights: List[int] = []
 		for (tid, u, v), (s, _iv) in assignments.items():
-			prio = next((1 if t.priority == TrainPriority.EXPRESS else 5 if t.priority == TrainPriority.PASSENGER else 10) for t in trains if t.train_id == tid)
-			obj_terms.append(s * prio)
-		model.Minimize(sum(obj_terms))
+			starts.append(s)
+			weights.append(prio_by_id[tid])
+		model.Minimize(cp_model.LinearExpr.WeightedSum(starts, weights))
 
 		solver = cp_model.CpSolver()
 		solver.parameters.max_time_in_seconds = 1.0
-		_ = solver.Solve(model)
+		status = solver.Solve(model)
 
-		plan: Dict[str, Any] = {"assignments": [], "status": solver.StatusName()}
+		plan: Dict[str, Any] = {"assignments": [], "status": solver.StatusName(status)}
 		for (tid, u, v), (s, iv) in assignments.items():
 			if solver.Value(s) is not None:
 				plan["assignments"].append({
@@ -135,8 +180,17 @@ class Optimizer:
 		return plan
 
 
+# Websocket telemetry schema v2: {"v": 2, "trains": [[train_id, priority, u, v, position_m,
+# edge_length_m, speed_mps, status, progress], ...]} with priority/status as the integer codes
+# below and u/v null when the train is not on an edge. The dashboard unpacks it by position;
+# GET /trains keeps the dict rows of telemetry_state().
+TELEMETRY_SCHEMA_VERSION = 2
+PRIORITY_CODES: Dict[str, int] = {"express": 0, "passenger": 1, "freight": 2}
+STATUS_CODES: Dict[str, int] = {"running": 0, "stopped": 1, "delayed": 2, "held": 3}
+
+
 class AsyncSimulation:
-	"""Async simulation loop with periodic optimization and broadcast queue."""
+	"""Async simulation loop with periodic optimization and latest-only broadcast to subscribers."""
 
 	def __init__(self, graph: nx.MultiDiGraph, tick_seconds: float = 0.5):
 		self.graph = graph
@@ -144,8 +198,27 @@ class AsyncSimulation:
 		self.tick_seconds = tick_seconds
 		self._running = False
 		self._task: Optional[asyncio.Task] = None
-		self._updates: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+		# newest plan/state message, each tagged with a publish sequence number; subscribers that fall
+		# behind skip straight to these instead of draining a backlog
+		self._seq = 0
+		self._latest_plan: Optional[Tuple[int, Dict[str, Any]]] = None
+		self._latest_state: Optional[Tuple[int, Dict[str, Any]]] = None
+		# set (and replaced) on every publish
+		self._changed = asyncio.Event()
 		self._optimizer = Optimizer()
+		# (u, v) -> (length m, speed cap m/s) of the first parallel edge; inf when the edge has no max_speed
+		self._edge_info: Dict[Tuple[str, str], Tuple[float, float]] = {}
+		self.reindex_edges()
+
+	def reindex_edges(self) -> None:
+		"""Cache per-edge length and speed cap so ticks don't walk NetworkX adjacency dicts; call again if the graph changes."""
+		edge_info: Dict[Tuple[str, str], Tuple[float, float]] = {}
+		for u, v, k, data in self.graph.edges(keys=True, data=True):
+			if (u, v) in edge_info and k != 0:
+				continue
+			vmax = data.get("max_speed")
+			edge_info[(u, v)] = (float(data.get("length", 0.0)), math.inf if vmax is None else float(vmax) / 3.6)
+		self._edge_info = edge_info
 
 	async def start(self) -> None:
 		if self._running:
@@ -160,49 +233,57 @@ class AsyncSimulation:
 
 	async def _loop(self) -> None:
 		last_opt = time.time()
+		last_plan: Optional[Dict[str, Any]] = None
 		while self._running:
 			self._tick(self.tick_seconds)
 			# optimize every 2s
 			if time.time() - last_opt > 2.0:
 				plan = self._optimizer.build_and_solve(self.graph, list(self.trains.values()), self.tick_seconds)
-				await self._updates.put({"type": "plan", "data": plan})
+				# the optimizer hands back the same plan object when nothing changed: don't resend it
+				if plan is not last_plan:
+					self._publish({"type": "plan", "data": plan})
+					last_plan = plan
 				last_opt = time.time()
 			# broadcast state
-			await self._updates.put({"type": "state", "data": self.telemetry_state()})
+			self._publish({"type": "state", "data": self.telemetry_rows()})
 			await asyncio.sleep(self.tick_seconds)
 
 	def _edge_length(self, u: str, v: str) -> float:
-		if self.graph.has_edge(u, v):
-			return float(self.graph[u][v][0].get("length", 0.0))
-		return 0.0
+		info = self._edge_info.get((u, v))
+		return info[0] if info else 0.0
 
 	def _advance_train(self, t: Train, dt: float) -> None:
+		edge_info = self._edge_info
 		if not t.position_edge:
 			# initialize
-			if len(t.path_nodes) >= 2 and self.graph.has_edge(t.path_nodes[0], t.path_nodes[1]):
+			if len(t.path_nodes) >= 2 and (t.path_nodes[0], t.path_nodes[1]) in edge_info:
 				t.position_edge = (t.path_nodes[0], t.path_nodes[1])
+				t.path_index = 0
 				t.position_m = 0.0
 				t.status = "running"
 			else:
 				t.status = "stopped"
 				return
 		u, v = t.position_edge
-		length = self._edge_length(u, v)
+		length, vmax_mps = edge_info.get((u, v), (0.0, math.inf))
 		if length <= 0:
 			t.status = "stopped"
 			return
-		vmax = self.graph[u][v][0].get("max_speed")
-		max_speed = t.max_speed_mps if vmax is None else min(t.max_speed_mps, float(vmax) / 3.6)
+		max_speed = min(t.max_speed_mps, vmax_mps)
 		t.speed_mps = min(max_speed, max(0.0, t.speed_mps or max_speed))
 		t.position_m = min(length, t.position_m + t.speed_mps * dt)
 		if t.position_m >= length - 1e-3:
-			# advance to next edge
-			if t.path_nodes and t.path_nodes.index(u) + 2 < len(t.path_nodes):
-				i = t.path_nodes.index(u) + 1
-				new_u = t.path_nodes[i]
-				new_v = t.path_nodes[i + 1]
-				if self.graph.has_edge(new_u, new_v):
+			# advance to next edge; path_index (not path_nodes.index) so a path may revisit a node
+			i = t.path_index
+			if not (i < len(t.path_nodes) and t.path_nodes[i] == u):
+				# position_edge was set without path_index
+				i = t.path_nodes.index(u) if u in t.path_nodes else len(t.path_nodes)
+			if i + 2 < len(t.path_nodes):
+				new_u = t.path_nodes[i + 1]
+				new_v = t.path_nodes[i + 2]
+				if (new_u, new_v) in edge_info:
 					t.position_edge = (new_u, new_v)
+					t.path_index = i + 1
 					t.position_m = 0.0
 					t.status = "running"
 					return
@@ -230,6 +311,27 @@ class AsyncSimulation:
 			})
 		return {"trains": out}
 
+	def telemetry_rows(self) -> Dict[str, Any]:
+		"""telemetry_state in the positional schema v2 (see TELEMETRY_SCHEMA_VERSION): one list per train."""
+		rows: List[List[Any]] = []
+		for t in self.trains.values():
+			u, v = t.position_edge if t.position_edge else (None, None)
+			length = self._edge_length(u, v) if u and v else 0.0
+			progress = 0.0 if length <= 0 else max(0.0, min(1.0, (t.position_m or 0.0) / length))
+			rows.append([
+				t.train_id,
+				# a str Enum hashes by member name, so look codes up by value
+				PRIORITY_CODES.get(getattr(t.priority, "value", t.priority), -1),
+				u if u and v else None,
+				v if u and v else None,
+				round(t.position_m, 2),
+				round(length, 2),
+				round(t.speed_mps, 2),
+				STATUS_CODES.get(t.status, -1),
+				round(progress, 4),
+			])
+		return {"v": TELEMETRY_SCHEMA_VERSION, "trains": rows}
+
 	# Public API
 	def add_train(self, train: Train) -> bool:
 		self.trains[train.train_id] = train
@@ -252,6 +354,7 @@ class AsyncSimulation:
 			if isinstance(path, list) and len(path) >= 2:
 				t.path_nodes = path
 				t.position_edge = (path[0], path[1]) if len(path) >= 2 else None
+				t.path_index = 0
 				t.position_m = 0.0
 				t.status = "running"
 				return True
@@ -265,5 +368,26 @@ class AsyncSimulation:
 			return True
 		return False
 
-	async def updates(self) -> "asyncio.Queue[Dict[str, Any]]":
-		return self._updates
+	def _publish(self, msg: Dict[str, Any]) -> None:
+		self._seq += 1
+		if msg["type"] == "plan":
+			self._latest_plan = (self._seq, msg)
+		else:
+			self._latest_state = (self._seq, msg)
+		changed, self._changed = self._changed, asyncio.Event()
+		changed.set()
+
+	async def updates(self) -> AsyncIterator[Dict[str, Any]]:
+		"""Yield plan/state messages as they are published, oldest first; a slow subscriber only gets the newest of each."""
+		seen = 0
+		while True:
+			# grab the event before reading the slots so a publish in between isn't missed
+			changed = self._changed
+			fresh = [m for m in (self._latest_plan, self._latest_state) if m is not None and m[0] > seen]
+			if not fresh:
+				await changed.wait()
+				continue
+			fresh.sort(key=lambda m: m[0])
+			for seq, msg in fresh:
+				seen = seq
+				yield msg